@@ -0,0 +1,165 @@
+"""
+Gunicorn settings for the API, used by the Procfile and render.yaml
+(`gunicorn -c gunicorn.conf.py wsgi`).
+
+Workers are gthread workers: most endpoints wait on the database, the ICS
+feed, Yelp or the weather API, and /api/bookings/stream holds a connection
+open, so several threads per process keep a slow request from blocking the
+others.
+
+There is one worker per CPU the container may use (affinity and cgroup CPU
+quota, not the host's count), capped by the memory that is actually
+available (container limit when there is one). The usual 2*CPU+1 is meant
+for sync workers; with threads on top it only adds processes competing for
+the same CPUs, and keep-alive connections pinned to a busy worker showed up
+as p99 spikes in load tests.
+
+Threads come in two parts: REQUEST_THREADS_PER_CPU for normal requests,
+plus one per open stream the worker allows (SSE_MAX_STREAMS, sized from the
+memory left per worker). api.events refuses streams beyond that with a 503,
+so open streams never take the request threads.
+
+This layout buys stream capacity, not speed: on a CPU-bound path such as
+/api/listings it serves about the same req/s as a plain sync worker, with a
+somewhat higher p99.
+
+Worker recycling and the access log are off by default: recycling a worker
+mid-traffic stalled requests and threw away its warm caches, and the
+platform router already logs every request.
+
+Every setting can be overridden from the environment:
+  WEB_CONCURRENCY            worker processes
+  GUNICORN_THREADS           threads per worker (default request threads + SSE_MAX_STREAMS)
+  SSE_MAX_STREAMS            open booking streams per worker (default from memory, at most 32)
+  GUNICORN_STREAM_MEMORY_MB  memory budget per open stream (default 4)
+  GUNICORN_WORKER_MEMORY_MB  memory budget per worker (default 150)
+  GUNICORN_TIMEOUT           seconds before a silent worker is restarted (default 30)
+  GUNICORN_MAX_REQUESTS      recycle a worker after this many requests (default 0, never)
+  GUNICORN_ACCESS_LOG        set to 1 to log every request to stdout
+  PORT                       bind port (default 8000)
+"""
+import importlib
+import math
+import os
+
+WORKER_MEMORY_MB = int(os.getenv("GUNICORN_WORKER_MEMORY_MB", "150"))
+STREAM_MEMORY_MB = int(os.getenv("GUNICORN_STREAM_MEMORY_MB", "4"))
+# CPU-bound request paths measured best with 2-4 threads per CPU
+REQUEST_THREADS_PER_CPU = 4
+MAX_STREAMS_PER_WORKER = 32
+
+
+def _available_memory_mb():
+    """cgroup v2/v1 limit when set, else MemAvailable from /proc/meminfo."""
+    for path in ("/sys/fs/cgroup/memory.max",
+                 "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # "max" or a huge v1 sentinel mean no limit
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def _available_cpus():
+    """CPUs this process may run on, lowered by a cgroup v2/v1 CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        cpus = os.cpu_count() or 1
+    quota = period = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = f.read().strip()
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = f.read().strip()
+        except OSError:
+            pass
+    # "max" (v2) or -1 (v1) mean no quota
+    if quota and quota.isdigit() and period and period.isdigit() and int(period):
+        cpus = min(cpus, max(math.ceil(int(quota) / int(period)), 1))
+    return cpus
+
+
+def _default_workers():
+    workers = _available_cpus()
+    memory = _available_memory_mb()
+    if memory:
+        workers = min(workers, memory // WORKER_MEMORY_MB)
+    return max(workers, 1)
+
+
+def _default_streams(workers):
+    """Open streams per worker that fit in the memory left after the worker budgets."""
+    memory = _available_memory_mb()
+    if not memory:
+        return 4
+    headroom = memory // workers - WORKER_MEMORY_MB
+    return max(1, min(headroom // STREAM_MEMORY_MB, MAX_STREAMS_PER_WORKER))
+
+
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY") or _default_workers())
+request_threads = REQUEST_THREADS_PER_CPU * max(_available_cpus() // workers, 1)
+max_streams = int(os.getenv("SSE_MAX_STREAMS") or _default_streams(workers))
+threads = int(os.getenv("GUNICORN_THREADS") or request_threads + max_streams)
+# read by api.events when the app is imported, in the master or the workers
+os.environ["SSE_MAX_STREAMS"] = str(max(1, min(max_streams, threads - request_threads)))
+
+# Import the app once in the master; workers fork with it already loaded.
+# The app defers its heavy imports to first use (see src/app.py); with
+# preload they are imported in the master instead (when_ready), so workers
+# share those pages too and no request pays for the import.
+preload_app = True
+PRELOAD_MODULES = ("requests", "icalendar", "pytz")
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# Heartbeat files on tmpfs; a disk-backed /tmp can stall workers in containers.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+if os.getenv("GUNICORN_ACCESS_LOG", "").lower() in ("1", "true", "yes", "on"):
+    accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """
+    Drop connections the master may have opened while importing the app, so
+    no two processes share a pooled socket. close=False leaves the parent's
+    connections alone instead of closing them from the child.
+    """
+    from api.models import db
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def when_ready(server):
+    """Runs in the master before the first fork."""
+    if server.cfg.preload_app:
+        for name in PRELOAD_MODULES:
+            importlib.import_module(name)
@@ -0,0 +1,66 @@
+"""bookings autoincrement
+
+Revision ID: 4b7e2c9d1a53
+Revises: 9c8a9d659506
+Create Date: 2026-10-19 13:05:12.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2c9d1a53'
+down_revision = '9c8a9d659506'
+branch_labels = None
+depends_on = None
+
+# Snapshot of the bookings triggers in api/search.py SQLITE_FTS_DDL; the
+# table rebuild below drops them.
+SQLITE_BOOKING_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS bookings_fts_ai AFTER INSERT ON bookings BEGIN
+        INSERT INTO bookings_fts(rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES (new.id, new.airbnb_guest_first_name, new.airbnb_guest_last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS bookings_fts_ad AFTER DELETE ON bookings BEGIN
+        INSERT INTO bookings_fts(bookings_fts, rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES ('delete', old.id, old.airbnb_guest_first_name, old.airbnb_guest_last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS bookings_fts_au AFTER UPDATE OF
+        airbnb_guest_first_name, airbnb_guest_last_name ON bookings BEGIN
+        INSERT INTO bookings_fts(bookings_fts, rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES ('delete', old.id, old.airbnb_guest_first_name, old.airbnb_guest_last_name);
+        INSERT INTO bookings_fts(rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES (new.id, new.airbnb_guest_first_name, new.airbnb_guest_last_name);
+    END""",
+]
+
+
+def _rebuild_bookings(autoincrement):
+    with op.batch_alter_table('bookings', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+    if op.get_bind().execute(sa.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bookings_fts'")).first():
+        for ddl in SQLITE_BOOKING_TRIGGERS:
+            op.execute(ddl)
+        op.execute("INSERT INTO bookings_fts(bookings_fts) VALUES ('rebuild')")
+
+
+def upgrade():
+    # Postgres sequences never reuse ids; SQLite without AUTOINCREMENT hands
+    # out max(id) + 1, which is an archived booking's id once it moved.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild_bookings(True)
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'bookings'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'bookings', coalesce(max(id), 0) "
+        "FROM (SELECT id FROM bookings UNION ALL SELECT id FROM bookings_archive)"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _rebuild_bookings(False)
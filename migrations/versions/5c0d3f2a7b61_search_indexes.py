@@ -0,0 +1,88 @@
+"""search indexes
+
+Revision ID: 5c0d3f2a7b61
+Revises: 23849a324811
+Create Date: 2026-10-19 12:10:41.218305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c0d3f2a7b61'
+down_revision = '23849a324811'
+branch_labels = None
+depends_on = None
+
+# Snapshot of PG_BOOKING_DOC / PG_LISTING_DOC / SQLITE_FTS_DDL in api/search.py
+PG_BOOKING_DOC = ("to_tsvector('simple', coalesce(bookings.airbnb_guest_first_name, '') "
+                  "|| ' ' || coalesce(bookings.airbnb_guest_last_name, ''))")
+PG_LISTING_DOC = ("to_tsvector('simple', coalesce(listings.name, '') || ' ' || "
+                  "coalesce(listings.street, '') || ' ' || coalesce(listings.city, '') || ' ' || "
+                  "coalesce(listings.state, '') || ' ' || coalesce(listings.airbnb_address, '') || ' ' || "
+                  "coalesce(listings.airbnb_zipcode, ''))")
+
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS bookings_fts USING fts5(
+        airbnb_guest_first_name, airbnb_guest_last_name,
+        content='bookings', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS bookings_fts_ai AFTER INSERT ON bookings BEGIN
+        INSERT INTO bookings_fts(rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES (new.id, new.airbnb_guest_first_name, new.airbnb_guest_last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS bookings_fts_ad AFTER DELETE ON bookings BEGIN
+        INSERT INTO bookings_fts(bookings_fts, rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES ('delete', old.id, old.airbnb_guest_first_name, old.airbnb_guest_last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS bookings_fts_au AFTER UPDATE OF
+        airbnb_guest_first_name, airbnb_guest_last_name ON bookings BEGIN
+        INSERT INTO bookings_fts(bookings_fts, rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES ('delete', old.id, old.airbnb_guest_first_name, old.airbnb_guest_last_name);
+        INSERT INTO bookings_fts(rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES (new.id, new.airbnb_guest_first_name, new.airbnb_guest_last_name);
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+        name, street, city, state, airbnb_address, airbnb_zipcode,
+        content='listings', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN
+        INSERT INTO listings_fts(rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES (new.id, new.name, new.street, new.city, new.state, new.airbnb_address, new.airbnb_zipcode);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES ('delete', old.id, old.name, old.street, old.city, old.state, old.airbnb_address, old.airbnb_zipcode);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_au AFTER UPDATE OF
+        name, street, city, state, airbnb_address, airbnb_zipcode ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES ('delete', old.id, old.name, old.street, old.city, old.state, old.airbnb_address, old.airbnb_zipcode);
+        INSERT INTO listings_fts(rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES (new.id, new.name, new.street, new.city, new.state, new.airbnb_address, new.airbnb_zipcode);
+    END""",
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(f"CREATE INDEX ix_bookings_guest_search ON bookings USING gin ({PG_BOOKING_DOC})")
+        op.execute(f"CREATE INDEX ix_listings_address_search ON listings USING gin ({PG_LISTING_DOC})")
+    elif bind.dialect.name == 'sqlite':
+        for ddl in SQLITE_FTS_DDL:
+            op.execute(ddl)
+        op.execute("INSERT INTO bookings_fts(bookings_fts) VALUES ('rebuild')")
+        op.execute("INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_listings_address_search', table_name='listings')
+        op.drop_index('ix_bookings_guest_search', table_name='bookings')
+    elif bind.dialect.name == 'sqlite':
+        for trigger in ('bookings_fts_ai', 'bookings_fts_ad', 'bookings_fts_au',
+                        'listings_fts_ai', 'listings_fts_ad', 'listings_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS bookings_fts")
+        op.execute("DROP TABLE IF EXISTS listings_fts")
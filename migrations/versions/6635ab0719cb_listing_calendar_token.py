@@ -0,0 +1,72 @@
+"""listing calendar token
+
+Revision ID: 6635ab0719cb
+Revises: 8e4e28b24469
+Create Date: 2026-10-19 12:12:29.695447
+
+"""
+import secrets
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6635ab0719cb'
+down_revision = '8e4e28b24469'
+branch_labels = None
+depends_on = None
+
+# Snapshot of the listings triggers in api/search.py SQLITE_FTS_DDL. On
+# SQLite the batch operations below rebuild listings, which drops them.
+SQLITE_LISTING_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN
+        INSERT INTO listings_fts(rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES (new.id, new.name, new.street, new.city, new.state, new.airbnb_address, new.airbnb_zipcode);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES ('delete', old.id, old.name, old.street, old.city, old.state, old.airbnb_address, old.airbnb_zipcode);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_au AFTER UPDATE OF
+        name, street, city, state, airbnb_address, airbnb_zipcode ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES ('delete', old.id, old.name, old.street, old.city, old.state, old.airbnb_address, old.airbnb_zipcode);
+        INSERT INTO listings_fts(rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES (new.id, new.name, new.street, new.city, new.state, new.airbnb_address, new.airbnb_zipcode);
+    END""",
+]
+
+
+def _restore_sqlite_fts():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not bind.execute(sa.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'listings_fts'")).first():
+        return
+    for ddl in SQLITE_LISTING_TRIGGERS:
+        op.execute(ddl)
+    op.execute("INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')")
+
+
+def upgrade():
+    with op.batch_alter_table('listings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('calendar_token', sa.String(length=64), nullable=True))
+
+    # give every existing listing its own export secret
+    listings = sa.table('listings', sa.column('id', sa.Integer), sa.column('calendar_token', sa.String))
+    conn = op.get_bind()
+    for (listing_id,) in conn.execute(sa.select(listings.c.id)).all():
+        conn.execute(listings.update().where(listings.c.id == listing_id)
+                     .values(calendar_token=secrets.token_urlsafe(24)))
+
+    with op.batch_alter_table('listings', schema=None) as batch_op:
+        batch_op.alter_column('calendar_token', existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_unique_constraint('uq_listings_calendar_token', ['calendar_token'])
+    _restore_sqlite_fts()
+
+
+def downgrade():
+    with op.batch_alter_table('listings', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_listings_calendar_token', type_='unique')
+        batch_op.drop_column('calendar_token')
+    _restore_sqlite_fts()
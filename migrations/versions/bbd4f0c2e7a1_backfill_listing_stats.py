@@ -0,0 +1,79 @@
+"""backfill listing stats
+
+Revision ID: bbd4f0c2e7a1
+Revises: 4b7e2c9d1a53
+Create Date: 2026-10-19 13:40:27.115804
+
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bbd4f0c2e7a1'
+down_revision = '4b7e2c9d1a53'
+branch_labels = None
+depends_on = None
+
+listing_stats = sa.table(
+    'listing_stats',
+    sa.column('listing_id', sa.Integer), sa.column('month', sa.Date),
+    sa.column('nights_booked', sa.Integer), sa.column('turnovers', sa.Integer),
+    sa.column('stays', sa.Integer), sa.column('stay_nights', sa.Integer),
+    sa.column('updated_at', sa.DateTime),
+)
+FIELDS = ('nights_booked', 'turnovers', 'stays', 'stay_nights')
+
+
+def _as_date(value):
+    if isinstance(value, str):  # sqlite through a textual select
+        value = datetime.fromisoformat(value)
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _next_month(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _add(totals, listing_id, checkin, last_night):
+    """Snapshot of api.stats.contributions; airbnb_checkout is the last night."""
+    checkin, last_night = _as_date(checkin), _as_date(last_night)
+    if not listing_id or not checkin or not last_night or last_night < checkin:
+        return
+    checkout = last_night + timedelta(days=1)
+    cursor = checkin
+    while cursor < checkout:
+        boundary = min(_next_month(cursor), checkout)
+        totals[(listing_id, cursor.replace(day=1))][0] += (boundary - cursor).days
+        cursor = boundary
+    totals[(listing_id, checkout.replace(day=1))][1] += 1
+    totals[(listing_id, checkin.replace(day=1))][2] += 1
+    totals[(listing_id, checkin.replace(day=1))][3] += (checkout - checkin).days
+
+
+def upgrade():
+    # listing_stats was created empty and only ever adjusted by deltas, so
+    # bookings older than it counted for nothing (and edits went negative).
+    # Recompute it from every booking, live and archived.
+    bind = op.get_bind()
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    rows = bind.execute(sa.text(
+        "SELECT listing_id, airbnb_checkin, airbnb_checkout FROM bookings "
+        "UNION ALL "
+        "SELECT listing_id, airbnb_checkin, airbnb_checkout FROM bookings_archive"))
+    for row in rows:
+        _add(totals, *row)
+    op.execute(listing_stats.delete())
+    now = datetime.utcnow()
+    if totals:
+        op.bulk_insert(listing_stats, [
+            {'listing_id': listing_id, 'month': month, 'updated_at': now, **dict(zip(FIELDS, values))}
+            for (listing_id, month), values in totals.items()
+        ])
+
+
+def downgrade():
+    pass
@@ -0,0 +1,68 @@
+"""
+Retention for the bookings table.
+
+archive_bookings() moves bookings whose checkout is older than a cutoff into
+bookings_archive in id-ordered batches, copying and deleting each batch in
+its own transaction, so it can be stopped and re-run at any point. Bookings
+still referenced as a listing's current booking are left in place.
+
+listing_stats is not touched: archived stays keep counting there, and
+rebuild_listing_stats() reads both tables. Read paths ask archive_needed()
+whether a requested range reaches back past archive_horizon() before
+querying the archive at all.
+"""
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import DateTime, delete, func, insert, literal, select
+
+from api.models import db, Booking, BookingArchive, Listing
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+COLUMNS = [c.name for c in Booking.__table__.columns]
+
+
+def archive_horizon() -> Optional[datetime]:
+    """Latest archived checkout (an index lookup), or None when the archive is empty."""
+    return db.session.execute(select(func.max(BookingArchive.airbnb_checkout))).scalar()
+
+
+def archive_needed(start: Optional[date]) -> bool:
+    """Whether bookings with checkout >= start may live in the archive."""
+    horizon = archive_horizon()
+    if horizon is None:
+        return False
+    return start is None or start <= horizon.date()
+
+
+def is_archived(listing_id: int, google_calendar_id: str) -> bool:
+    return db.session.execute(
+        select(BookingArchive.id).where(
+            BookingArchive.listing_id == listing_id,
+            BookingArchive.google_calendar_id == google_calendar_id)
+    ).first() is not None
+
+
+def archive_bookings(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = 1000) -> int:
+    """Move bookings that checked out before now - older_than_days. Returns rows moved."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    current = select(Listing.current_booking_id).where(Listing.current_booking_id.is_not(None))
+    moved = 0
+    while True:
+        ids = db.session.execute(
+            select(Booking.id)
+            .where(Booking.airbnb_checkout < cutoff, Booking.id.not_in(current))
+            .order_by(Booking.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return moved
+        rows = select(
+            *[Booking.__table__.c[name] for name in COLUMNS],
+            literal(datetime.utcnow(), DateTime),
+        ).where(Booking.id.in_(ids))
+        db.session.execute(
+            insert(BookingArchive).from_select(COLUMNS + ["archived_at"], rows))
+        db.session.execute(delete(Booking).where(Booking.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
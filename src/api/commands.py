@@ -1,6 +1,16 @@
 
+import os
+import subprocess
+import sys
 import click
-from api.models import db, User
+from sqlalchemy import select
+from api.models import db, User, SyncJob
+from api.compression import precompress_directory
+from api.stats import rebuild_listing_stats
+from api.sync import claim_stale_job, job_is_stale, run_sync_job
+from api.geocoding import geocode_listings
+from api.archive import ARCHIVE_AFTER_DAYS, archive_bookings
+from api.occupancy import timeline
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
@@ -31,4 +41,81 @@ def setup_commands(app):
 
     @app.cli.command("insert-test-data")
     def insert_test_data():
-        pass
\ No newline at end of file
+        pass
+
+    @app.cli.command("precompress-static")
+    @click.argument("directory", required=False)
+    def precompress_static(directory):
+        """Write .gz/.br siblings for the built frontend (run after `npm run build`)."""
+        root = directory or os.path.join(app.root_path, "..", "dist")
+        written = precompress_directory(root)
+        print("Precompressed", written, "files in", os.path.realpath(root))
+
+    @app.cli.command("rebuild-listing-stats")
+    @click.option("--listing-id", type=int, default=None)
+    def rebuild_stats(listing_id):
+        """Recompute listing_stats from the bookings table (backfill/repair)."""
+        rows = rebuild_listing_stats(listing_id)
+        db.session.commit()
+        print("Wrote", rows, "listing_stats rows")
+
+    @app.cli.command("run-sync-jobs")
+    def run_sync_jobs():
+        """Drain queued sync jobs and resume running ones whose worker went away."""
+        jobs = db.session.execute(
+            select(SyncJob).where(SyncJob.status.in_(("queued", "running")))
+            .order_by(SyncJob.id)
+        ).scalars().all()
+        for job in jobs:
+            if job.status == "running" and not (job_is_stale(job) and claim_stale_job(job)):
+                continue
+            job = run_sync_job(job.id)
+            print("Sync job", job.id, job.status, f"{job.processed}/{job.total}")
+
+    @app.cli.command("geocode-listings")
+    @click.option("--batch-size", type=int, default=100)
+    @click.option("--force", is_flag=True, help="Re-geocode listings that already have coordinates")
+    def geocode_listings_command(batch_size, force):
+        """Fill Listing.latitude/longitude through the geocode cache."""
+        counts = geocode_listings(batch_size=batch_size, force=force)
+        print("Geocoded", counts["listings"], "listings from", counts["addresses"],
+              "distinct addresses,", counts["located"], "located")
+
+    @app.cli.command("archive-bookings")
+    @click.option("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS,
+                  help="Archive bookings that checked out more than this many days ago")
+    @click.option("--batch-size", type=int, default=1000)
+    def archive_bookings_command(older_than_days, batch_size):
+        """Move old bookings into bookings_archive, one transaction per batch."""
+        # current stays are skipped by current_booking_id, so bring it up to date first
+        timeline.refresh()
+        moved = archive_bookings(older_than_days, batch_size)
+        print("Archived", moved, "bookings that checked out more than", older_than_days, "days ago")
+
+    @app.cli.command("refresh-occupancy")
+    def refresh_occupancy():
+        """Recompute every listing's current booking (for cron when no web worker is running)."""
+        changed = timeline.refresh()
+        print("Updated the current booking of", changed, "listings")
+
+    @app.cli.command("profile-imports")
+    @click.option("--top", type=int, default=15)
+    def profile_imports(top):
+        """Import the app in a fresh interpreter under -X importtime and list the slowest modules."""
+        env = dict(os.environ, SERVER_SOFTWARE=os.getenv("SERVER_SOFTWARE", "gunicorn"))
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app"],
+            cwd=app.root_path, env=env, capture_output=True, text=True)
+        rows = []
+        for line in proc.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|", 2)
+            rows.append((int(cumulative), name[1:].rstrip()))
+        if proc.returncode != 0:
+            raise click.ClickException(proc.stderr.strip().splitlines()[-1])
+        total = sum(c for c, name in rows if not name.startswith(" "))
+        for cumulative, name in sorted(rows, reverse=True)[:top]:
+            print(f"{cumulative / 1000:8.1f} ms  {name.strip()}")
+        print(f"{total / 1000:8.1f} ms  total (top-level imports)")
@@ -0,0 +1,86 @@
+"""
+Response compression.
+
+- JSON responses above COMPRESS_MIN_SIZE are gzip/brotli encoded on the fly,
+  depending on the client's Accept-Encoding.
+- `flask precompress-static` writes file.br / file.gz siblings for the
+  frontend build; api.static_files serves them when the client accepts them.
+"""
+import gzip
+import os
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/calendar"}
+STATIC_COMPRESSIBLE_EXT = (".html", ".js", ".mjs", ".css", ".json", ".svg",
+                           ".txt", ".map", ".xml", ".ico")
+
+
+def _encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding():
+    """Pick the best encoding the client accepts, or None for identity."""
+    return request.accept_encodings.best_match(_encodings())
+
+
+def compress_bytes(data: bytes, encoding: str, level: int | None = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=level if level is not None else 5)
+    return gzip.compress(data, compresslevel=level if level is not None else 6)
+
+
+def compress_response(response, min_size: int):
+    response.vary.add("Accept-Encoding")
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    encoding = negotiate_encoding()
+    if not encoding:
+        return response
+    response.set_data(compress_bytes(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(app):
+    app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, app.config["COMPRESS_MIN_SIZE"])
+
+
+def precompress_directory(root: str, min_size: int = 256):
+    """Write .gz (and .br when available) next to every compressible file."""
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if not name.endswith(STATIC_COMPRESSIBLE_EXT):
+                continue
+            full = os.path.join(dirpath, name)
+            with open(full, "rb") as fh:
+                data = fh.read()
+            if len(data) < min_size:
+                continue
+            for encoding, ext in (("gzip", ".gz"), ("br", ".br")):
+                if encoding == "br" and brotli is None:
+                    continue
+                packed = compress_bytes(data, encoding,
+                                        level=11 if encoding == "br" else 9)
+                if len(packed) >= len(data):
+                    continue
+                with open(full + ext, "wb") as fh:
+                    fh.write(packed)
+                written += 1
+    return written
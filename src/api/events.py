@@ -0,0 +1,249 @@
+"""
+Broker for booking change events, consumed by the SSE endpoint
+GET /api/bookings/stream.
+
+Write paths publish after they commit. publish() stores the event in the
+booking_events table, whose id is the SSE event id, so ids are global across
+gunicorn workers and a client can resume from its Last-Event-ID on whichever
+worker it reconnects to. Each worker runs one relay thread that reads new
+rows into a bounded in-memory history and wakes its connected clients with a
+single Condition. On Postgres the relay LISTENs on the booking_events
+channel, which publish() NOTIFYs; elsewhere it polls every RELAY_POLL_SECONDS.
+A resume id older than the history triggers a "reset" event telling the
+client to refetch /api/bookings.
+
+Events carry the listing owner's user id and a client only receives events
+for its own listings. Every open stream holds a gthread worker thread, so
+streams are capped per worker (SSE_MAX_STREAMS, kept below the thread
+count); the endpoint answers 503 when no slot is free.
+
+Inserts are serialized (an advisory lock on Postgres, the write lock on
+SQLite) so ids become visible in order and the relay never skips one.
+"""
+import logging
+import os
+import select as selectors
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, text
+
+from api.models import db, BookingEvent, Listing
+
+HISTORY_SIZE = 1000
+MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "2"))
+HEARTBEAT_SECONDS = 15
+RELAY_POLL_SECONDS = float(os.getenv("EVENT_RELAY_POLL_SECONDS", "1"))
+EVENT_RETENTION = timedelta(hours=int(os.getenv("EVENT_RETENTION_HOURS", "24")))
+PRUNE_EVERY_SECONDS = 600
+CHANNEL = "booking_events"
+PUBLISH_LOCK_KEY = 0x626F6F6B  # pg_advisory_xact_lock key, "book"
+
+log = logging.getLogger(__name__)
+
+# (event id, kind, owner user_id, listing_id, encoded json payload)
+Event = Tuple[int, str, Optional[int], Optional[int], str]
+EVENT_COLUMNS = (BookingEvent.id, BookingEvent.kind, BookingEvent.user_id,
+                 BookingEvent.listing_id, BookingEvent.data)
+
+
+class BookingEventBroker:
+    def __init__(self, history: int = HISTORY_SIZE):
+        self._events: deque = deque(maxlen=history)
+        self._last_id = 0
+        # events with id <= _floor are no longer in the history
+        self._floor = 0
+        self._cond = threading.Condition()
+        self._relay: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, kind: str, booking: dict) -> int:
+        """Record a create/update/cancel event for a serialized booking."""
+        return self.publish_many([(kind, booking)])[0]
+
+    def publish_many(self, events: Iterable[Tuple[str, dict]]) -> List[int]:
+        """
+        Record (kind, serialized booking) events with one multi-row INSERT
+        in one transaction and a single NOTIFY. Returns the new ids.
+        """
+        events = list(events)
+        if not events:
+            return []
+        listing_ids = {booking.get("listing_id") for _, booking in events} - {None}
+        now = datetime.utcnow()
+        # own connection and transaction: callers have already committed theirs
+        with db.engine.begin() as conn:
+            postgres = conn.dialect.name == "postgresql"
+            if postgres:
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"),
+                             {"key": PUBLISH_LOCK_KEY})
+            owners = dict(conn.execute(
+                select(Listing.id, Listing.user_id).where(Listing.id.in_(listing_ids))).all())
+            rows = [{"kind": kind, "user_id": owners.get(booking.get("listing_id")),
+                     "listing_id": booking.get("listing_id"),
+                     "data": current_app.json.dumps(booking), "created_at": now}
+                    for kind, booking in events]
+            event_ids = conn.execute(
+                insert(BookingEvent).returning(BookingEvent.id),
+                rows).scalars().all()
+            if postgres:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                             {"channel": CHANNEL, "payload": str(max(event_ids))})
+        self._wake.set()
+        return event_ids
+
+    # ---- relay ---------------------------------------------------------------
+
+    def start(self, app) -> None:
+        """Load the recent history and start this process's relay (once)."""
+        with self._cond:
+            if self._relay is not None and self._relay.is_alive():
+                return
+            with app.app_context():
+                self._load_history()
+            self._relay = threading.Thread(
+                target=self._run, args=(app,), name="booking-event-relay", daemon=True)
+            self._relay.start()
+
+    def _load_history(self) -> None:
+        rows = db.session.execute(
+            select(*EVENT_COLUMNS)
+            .order_by(BookingEvent.id.desc())
+            .limit(self._events.maxlen)
+        ).all()
+        db.session.remove()
+        rows.reverse()
+        self._events.clear()
+        self._events.extend(tuple(r) for r in rows)
+        if rows:
+            self._floor = rows[0][0] - 1
+            self._last_id = rows[-1][0]
+
+    def _append(self, rows) -> None:
+        with self._cond:
+            for row in rows:
+                if len(self._events) == self._events.maxlen:
+                    self._floor = self._events[0][0]
+                self._events.append(tuple(row))
+                self._last_id = row[0]
+            self._cond.notify_all()
+
+    def _poll(self, conn) -> None:
+        rows = conn.execute(
+            select(*EVENT_COLUMNS)
+            .where(BookingEvent.id > self._last_id)
+            .order_by(BookingEvent.id)
+        ).all()
+        conn.rollback()  # end the read transaction so the next poll sees new rows
+        if rows:
+            self._append(rows)
+
+    def _prune(self, conn) -> None:
+        cutoff = datetime.utcnow() - EVENT_RETENTION
+        # keep the newest row even when it is old, so sqlite never reuses its id
+        newest = select(func.max(BookingEvent.id)).scalar_subquery()
+        conn.execute(delete(BookingEvent).where(
+            BookingEvent.created_at < cutoff, BookingEvent.id < newest))
+        conn.commit()
+
+    def _run(self, app) -> None:
+        with app.app_context():
+            engine = db.engine
+        listener = None
+        last_prune = 0.0
+        while True:
+            try:
+                if listener is None and engine.dialect.name == "postgresql":
+                    listener = _listen(engine)
+                with engine.connect() as conn:
+                    self._poll(conn)
+                    if time.monotonic() - last_prune > PRUNE_EVERY_SECONDS:
+                        self._prune(conn)
+                        last_prune = time.monotonic()
+                if listener is not None:
+                    _wait_notify(listener, RELAY_POLL_SECONDS)
+                else:
+                    self._wake.wait(RELAY_POLL_SECONDS)
+                    self._wake.clear()
+            except Exception:
+                log.exception("booking event relay failed; retrying")
+                if listener is not None:
+                    listener.invalidate()
+                    listener = None
+                time.sleep(RELAY_POLL_SECONDS)
+
+    # ---- clients ---------------------------------------------------------------
+
+    def since(self, last_id: int) -> Optional[List[Event]]:
+        """Events after last_id, or None if they already fell out of the history."""
+        if last_id < self._floor:
+            return None
+        return [e for e in self._events if e[0] > last_id]
+
+    def wait(self, last_id: int, timeout: float) -> Optional[List[Event]]:
+        with self._cond:
+            self._cond.wait_for(lambda: self._last_id > last_id, timeout)
+            return self.since(last_id)
+
+    def acquire_stream(self) -> bool:
+        """Take a stream slot without blocking; False when the worker is full."""
+        return self._slots.acquire(blocking=False)
+
+    def release_stream(self) -> None:
+        self._slots.release()
+
+    def stream(self, user_id: int, last_id: Optional[int] = None,
+               listing_id: Optional[int] = None,
+               heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+        """
+        SSE lines for a client; only events for user_id's listings are sent.
+        Does not touch the app or DB once started.
+        """
+        # a larger id may come from another worker that relayed it first; keep it
+        if last_id is None:
+            last_id = self._last_id
+        yield "retry: 3000\n\n"
+        while True:
+            started = time.monotonic()
+            events = self.wait(last_id, heartbeat)
+            if events is None:
+                last_id = self._last_id
+                yield f"id: {last_id}\nevent: reset\ndata: {{}}\n\n"
+                continue
+            if not events and time.monotonic() - started >= heartbeat:
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, kind, owner, event_listing, data in events:
+                last_id = event_id
+                if owner != user_id or (listing_id is not None and event_listing != listing_id):
+                    continue
+                yield f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n"
+
+
+def _listen(engine):
+    """A dedicated autocommit DBAPI connection LISTENing on CHANNEL."""
+    conn = engine.raw_connection()
+    driver = conn.driver_connection
+    driver.autocommit = True
+    with driver.cursor() as cur:
+        cur.execute(f"LISTEN {CHANNEL}")
+    return conn
+
+
+def _wait_notify(conn, timeout: float) -> None:
+    """Block until a NOTIFY arrives (or timeout) and drain the queue."""
+    driver = conn.driver_connection
+    if selectors.select([driver], [], [], timeout)[0]:
+        driver.poll()
+        driver.notifies.clear()
+
+
+broker = BookingEventBroker()
@@ -0,0 +1,149 @@
+"""
+Listing geocoding with a persistent address cache.
+
+Addresses are normalized (case, punctuation, whitespace) and looked up in
+geocode_cache before any provider call, so each distinct address is
+geocoded once across all listings and workers. The provider is chosen with
+GEOCODER:
+  nominatim   OpenStreetMap Nominatim (default; GEOCODER_USER_AGENT, GEOCODER_URL)
+  stub        deterministic fake coordinates, no network (local dev/tests)
+"""
+import hashlib
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+
+from api.models import db, GeocodeCache, Listing
+
+Coords = Optional[Tuple[float, float]]
+RE_NON_WORD = re.compile(r"[^\w\s]")
+RE_SPACES = re.compile(r"\s+")
+
+
+def normalize_address(address: str) -> str:
+    address = RE_NON_WORD.sub(" ", (address or "").lower())
+    return RE_SPACES.sub(" ", address).strip()[:512]
+
+
+def listing_address(listing: Listing) -> str:
+    if listing.street and listing.city:
+        parts = [listing.street, listing.city, listing.state, listing.airbnb_zipcode]
+    else:
+        parts = [listing.airbnb_address, listing.airbnb_zipcode]
+    return ", ".join(p for p in parts if p)
+
+
+class NominatimGeocoder:
+    name = "nominatim"
+    min_interval = 1.0  # Nominatim usage policy: at most 1 request per second
+
+    def __init__(self):
+        self.url = os.getenv("GEOCODER_URL", "https://nominatim.openstreetmap.org/search")
+        self.user_agent = os.getenv("GEOCODER_USER_AGENT", "4geeks-listings-geocoder")
+        self._last_call = 0.0
+
+    def geocode(self, address: str) -> Coords:
+        wait = self._last_call + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_call = time.monotonic()
+        import requests
+        resp = requests.get(
+            self.url,
+            params={"q": address, "format": "json", "limit": 1},
+            headers={"User-Agent": self.user_agent},
+            timeout=10,
+        )
+        resp.raise_for_status()
+        results = resp.json()
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+
+class StubGeocoder:
+    """Stable coordinates derived from the address hash; never calls out."""
+    name = "stub"
+
+    def geocode(self, address: str) -> Coords:
+        digest = hashlib.sha256(address.encode("utf-8")).digest()
+        lat = int.from_bytes(digest[:4], "big") / 2**32 * 180 - 90
+        lon = int.from_bytes(digest[4:8], "big") / 2**32 * 360 - 180
+        return round(lat, 6), round(lon, 6)
+
+
+GEOCODERS = {"nominatim": NominatimGeocoder, "stub": StubGeocoder}
+_geocoder = None
+
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None:
+        name = os.getenv("GEOCODER", "nominatim").lower()
+        if name not in GEOCODERS:
+            raise RuntimeError(f"Unknown GEOCODER: {name}")
+        _geocoder = GEOCODERS[name]()
+    return _geocoder
+
+
+def geocode_address(address: str, geocoder=None) -> Coords:
+    """Cached lookup of one address. Misses are cached too."""
+    key = normalize_address(address)
+    if not key:
+        return None
+    cached = db.session.get(GeocodeCache, key)
+    if cached is None:
+        geocoder = geocoder or get_geocoder()
+        coords = geocoder.geocode(address)
+        cached = GeocodeCache(
+            address_key=key,
+            latitude=coords[0] if coords else None,
+            longitude=coords[1] if coords else None,
+            provider=geocoder.name,
+        )
+        db.session.merge(cached)
+    if cached.latitude is None:
+        return None
+    return cached.latitude, cached.longitude
+
+
+def listing_coords(listing: Listing) -> Coords:
+    """Stored coordinates, or geocode (through the cache) and store them."""
+    if listing.latitude is not None and listing.longitude is not None:
+        return listing.latitude, listing.longitude
+    coords = geocode_address(listing_address(listing))
+    if coords:
+        listing.latitude, listing.longitude = coords
+    db.session.commit()
+    return coords
+
+
+def geocode_listings(batch_size: int = 100, force: bool = False, geocoder=None) -> Dict[str, int]:
+    """
+    Fill latitude/longitude for listings, committing per batch. Listings are
+    grouped by normalized address so each distinct address costs at most
+    one provider call (none when it is already cached).
+    """
+    geocoder = geocoder or get_geocoder()
+    q = select(Listing).order_by(Listing.id)
+    if not force:
+        q = q.where(Listing.latitude.is_(None))
+    listings: List[Listing] = db.session.execute(q).scalars().all()
+    counts = {"listings": 0, "addresses": 0, "located": 0}
+    for start in range(0, len(listings), batch_size):
+        by_key: Dict[str, List[Listing]] = {}
+        for listing in listings[start:start + batch_size]:
+            address = listing_address(listing)
+            by_key.setdefault(normalize_address(address), []).append(listing)
+        for key, group in by_key.items():
+            coords = geocode_address(listing_address(group[0]), geocoder)
+            counts["addresses"] += 1
+            for listing in group:
+                counts["listings"] += 1
+                if coords:
+                    listing.latitude, listing.longitude = coords
+                    counts["located"] += 1
+        db.session.commit()
+    return counts
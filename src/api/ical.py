@@ -0,0 +1,94 @@
+"""
+iCalendar export of a listing's bookings for channel managers
+(GET /api/listings/<id>/calendar.ics?token=<Listing.calendar_token>).
+
+Bookings become all-day "Reserved" events without guest details, since the
+feed URL is shared with third parties. DTEND is exclusive, so it is the day
+after the stored last night (airbnb_checkout); importing the feed with
+_parse_reserved_rows gives back the original dates.
+
+Rendered feeds are cached per listing under their version (booking count,
+latest booking updated_at and the listing name), so a poll costs one
+aggregate query and returns either a 304 or the cached body.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Tuple
+
+from api.models import departure_date
+
+PRODID = "-//4Geeks Listings//Calendar Export//EN"
+CACHE_SIZE = int(os.getenv("ICS_CACHE_SIZE", "256"))
+
+# (id, google_calendar_id, airbnb_checkin, airbnb_checkout, updated_at)
+Row = Tuple[int, Optional[str], Optional[datetime], Optional[datetime], datetime]
+
+
+def escape_text(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def fold(line: str) -> str:
+    """Fold a content line at 75 octets (RFC 5545 3.1) without splitting characters."""
+    if len(line.encode("utf-8")) <= 75:
+        return line + "\r\n"
+    out, size, limit = [], 0, 75
+    for ch in line:
+        width = len(ch.encode("utf-8"))
+        if size + width > limit:
+            out.append("\r\n ")
+            size, limit = 0, 74  # continuation lines start with a space
+        out.append(ch)
+        size += width
+    out.append("\r\n")
+    return "".join(out)
+
+
+def write_calendar(name: str, rows: Iterable[Row]) -> Iterator[str]:
+    """Yield the VCALENDAR one folded line at a time."""
+    yield fold("BEGIN:VCALENDAR")
+    yield fold("VERSION:2.0")
+    yield fold(f"PRODID:{PRODID}")
+    yield fold("CALSCALE:GREGORIAN")
+    yield fold(f"X-WR-CALNAME:{escape_text(name)}")
+    for booking_id, uid, checkin, last_night, updated_at in rows:
+        if checkin is None or last_night is None:
+            continue
+        yield fold("BEGIN:VEVENT")
+        yield fold(f"UID:{escape_text(uid or f'booking-{booking_id}')}")
+        yield fold(f"DTSTAMP:{updated_at:%Y%m%dT%H%M%SZ}")
+        yield fold(f"DTSTART;VALUE=DATE:{checkin:%Y%m%d}")
+        yield fold(f"DTEND;VALUE=DATE:{departure_date(last_night):%Y%m%d}")
+        yield fold("SUMMARY:Reserved")
+        yield fold("END:VEVENT")
+    yield fold("END:VCALENDAR")
+
+
+class CalendarCache:
+    """Latest rendered feed per listing, least recently used evicted first."""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[int, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, listing_id: int, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(listing_id)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(listing_id)
+            return entry[1]
+
+    def put(self, listing_id: int, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[listing_id] = (etag, body)
+            self._entries.move_to_end(listing_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+calendar_cache = CalendarCache()
@@ -1,23 +1,44 @@
 from __future__ import annotations
-from datetime import datetime, date
+import secrets
+from datetime import datetime, date, timedelta
 from typing import List, Optional
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import (
     String,
     Integer,
+    Text,
     Boolean,
     LargeBinary,
+    Float,
     ForeignKey,
     Date,
     DateTime,
     CheckConstraint,
+    Index,
     UniqueConstraint,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import text
 db = SQLAlchemy()
+# ---- Row serialization ------------------------------------------------------
+class RowSerializable:
+    """
+    Column-projected serialization: select(*Model.serialize_columns()) returns
+    plain row tuples that serialize_row() zips into the public dict, so list
+    endpoints skip ORM object hydration. Datetimes are left as-is and encoded
+    by the app's JSON provider.
+    """
+    __serialize_fields__: tuple = ()
+    @classmethod
+    def serialize_columns(cls) -> list:
+        return [getattr(cls, f) for f in cls.__serialize_fields__]
+    @classmethod
+    def serialize_row(cls, row) -> dict:
+        return dict(zip(cls.__serialize_fields__, row))
 # ---- User -------------------------------------------------------------------
-class User(db.Model):
+class User(RowSerializable, db.Model):
     __tablename__ = "users"
+    __serialize_fields__ = ("id", "email", "is_active", "favorite_pet")
     id: Mapped[int] = mapped_column(primary_key=True)
     email: Mapped[str] = mapped_column(
         String(255), unique=True, nullable=False, index=True)
@@ -47,8 +68,13 @@ class User(db.Model):
             "favorite_pet": self.favorite_pet,
         }
 # ---- Listing ----------------------------------------------------------------
-class Listing(db.Model):
+class Listing(RowSerializable, db.Model):
     __tablename__ = "listings"
+    __serialize_fields__ = (
+        "id", "name", "street", "city", "state", "image_url", "user_id",
+        "current_booking_id", "airbnb_address", "airbnb_zipcode",
+        "latitude", "longitude",
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     street: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
@@ -62,7 +88,7 @@ class Listing(db.Model):
         DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     # Foreign Keys
     user_id: Mapped[int] = mapped_column(ForeignKey(
-        "users.id", ondelete="CASCADE"), nullable=False)
+        "users.id", ondelete="CASCADE"), nullable=False, index=True)
     current_booking_id: Mapped[Optional[int]] = mapped_column(
         ForeignKey("bookings.id", use_alter=True,
                    name="fk_listings_current_booking"),
@@ -72,6 +98,12 @@ class Listing(db.Model):
     airbnb_address: Mapped[str] = mapped_column(String(255), nullable=False)
     airbnb_zipcode: Mapped[Optional[str]] = mapped_column(
         String(15), nullable=True)
+    # Filled by the geocoding job (api.geocoding)
+    latitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    longitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # Secret in the public iCal export URL (api.ical); rotate to revoke
+    calendar_token: Mapped[str] = mapped_column(
+        String(64), nullable=False, unique=True, default=lambda: secrets.token_urlsafe(24))
     # Relationships
     owner: Mapped["User"] = relationship(back_populates="listings")
     bookings: Mapped[List["Booking"]] = relationship(
@@ -101,10 +133,25 @@ class Listing(db.Model):
             "current_booking_id": self.current_booking_id,
             "airbnb_address": self.airbnb_address,
             "airbnb_zipcode": self.airbnb_zipcode,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
         }
 # ---- Booking ----------------------------------------------------------------
-class Booking(db.Model):
+def departure_date(last_night):
+    """
+    Day the guest leaves. airbnb_checkout stores the last night of the stay
+    (the feed's exclusive all-day DTEND minus one day, see
+    _fix_all_day_checkout), so departure is the day after it.
+    """
+    return last_night + timedelta(days=1) if last_night is not None else None
+class Booking(RowSerializable, db.Model):
     __tablename__ = "bookings"
+    __serialize_fields__ = (
+        "id", "google_calendar_id", "listing_id", "airbnb_guest_first_name",
+        "airbnb_guest_last_name", "airbnb_checkin", "airbnb_checkout",
+        "reservation_url", "airbnb_guestpic_url", "needs_manual_details",
+        "phone_last4",
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     google_calendar_id: Mapped[Optional[str]] = mapped_column(
         String(255), index=True, nullable=True)
@@ -119,6 +166,7 @@ class Booking(db.Model):
                                    ] = mapped_column(String(120), nullable=True)
     airbnb_checkin: Mapped[Optional[datetime]
                            ] = mapped_column(DateTime, nullable=True)
+    # last night of the stay, not the departure day (see departure_date)
     airbnb_checkout: Mapped[Optional[datetime]
                             ] = mapped_column(DateTime, nullable=True)
     reservation_url: Mapped[Optional[str]] = mapped_column(
@@ -148,6 +196,11 @@ class Booking(db.Model):
         ),
         UniqueConstraint("listing_id", "google_calendar_id",
                          name="uq_booking_listing_googleid"),
+        # admin queue: WHERE needs_manual_details ORDER BY airbnb_checkin, id
+        Index("ix_bookings_manual_queue",
+              "needs_manual_details", "airbnb_checkin", "id"),
+        # never hand out an archived booking's id again (api.archive keeps ids)
+        {"sqlite_autoincrement": True},
     )
     def __repr__(self) -> str:
         return f"<Booking {self.id} {self.google_calendar_id or ''}>"
@@ -164,4 +217,157 @@ class Booking(db.Model):
             "airbnb_guestpic_url": self.airbnb_guestpic_url,
             "needs_manual_details": self.needs_manual_details,
             "phone_last4": self.phone_last4,
-        }
\ No newline at end of file
+        }
+# ---- ListingStat ------------------------------------------------------------
+class ListingStat(db.Model):
+    """
+    Per listing, per calendar month aggregates maintained incrementally by
+    api.stats whenever a booking is created, moved or re-dated.
+    """
+    __tablename__ = "listing_stats"
+    listing_id: Mapped[int] = mapped_column(ForeignKey(
+        "listings.id", ondelete="CASCADE"), primary_key=True)
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+    nights_booked: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0)
+    turnovers: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0)  # checkouts in the month
+    stays: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0)  # checkins in the month
+    stay_nights: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0)  # total length of those stays
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    def __repr__(self) -> str:
+        return f"<ListingStat {self.listing_id} {self.month}>"
+    def serialize(self) -> dict:
+        days = ((self.month.replace(day=28) + timedelta(days=4)).replace(day=1) - self.month).days
+        return {
+            "listing_id": self.listing_id,
+            "month": self.month.strftime("%Y-%m"),
+            "nights_booked": self.nights_booked,
+            "occupancy_rate": round(self.nights_booked / days, 4),
+            "turnovers": self.turnovers,
+            "stays": self.stays,
+            "average_stay_length": round(self.stay_nights / self.stays, 2) if self.stays else None,
+        }
+# ---- SyncJob ----------------------------------------------------------------
+class SyncJob(db.Model):
+    """A background ICS -> bookings sync for one listing, with progress."""
+    __tablename__ = "sync_jobs"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    listing_id: Mapped[int] = mapped_column(ForeignKey(
+        "listings.id", ondelete="CASCADE"), nullable=False)
+    # queued -> running -> succeeded | failed
+    status: Mapped[str] = mapped_column(
+        String(16), nullable=False, default="queued", index=True)
+    total: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    processed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    error: Mapped[Optional[str]] = mapped_column(String(1024), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # resume checkpoint: feed key (checkin, uid) of the last committed row
+    last_checkin: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)
+    last_uid: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    __table_args__ = (
+        # at most one queued/running job per listing, across all workers
+        Index("uq_sync_jobs_active_listing", "listing_id", unique=True,
+              postgresql_where=text("status IN ('queued', 'running')"),
+              sqlite_where=text("status IN ('queued', 'running')")),
+    )
+    def __repr__(self) -> str:
+        return f"<SyncJob {self.id} {self.status}>"
+    def serialize(self) -> dict:
+        return {
+            "id": self.id,
+            "listing_id": self.listing_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "created": self.created,
+            "updated": self.updated,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+# ---- GeocodeCache -----------------------------------------------------------
+class GeocodeCache(db.Model):
+    """Normalized address -> coordinates. NULL coordinates cache a miss."""
+    __tablename__ = "geocode_cache"
+    address_key: Mapped[str] = mapped_column(String(512), primary_key=True)
+    latitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    longitude: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    provider: Mapped[str] = mapped_column(String(32), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow)
+    def __repr__(self) -> str:
+        return f"<GeocodeCache {self.address_key}>"
+# ---- BookingArchive ---------------------------------------------------------
+class BookingArchive(RowSerializable, db.Model):
+    """
+    Cold copy of bookings that checked out long ago, moved here in batches by
+    api.archive so the hot bookings table stays bounded by the active horizon.
+    Rows keep their original id; columns mirror Booking plus archived_at.
+    """
+    __tablename__ = "bookings_archive"
+    __serialize_fields__ = Booking.__serialize_fields__
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    google_calendar_id: Mapped[Optional[str]] = mapped_column(
+        String(255), nullable=True)
+    listing_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("listings.id", ondelete="CASCADE"), nullable=True)
+    airbnb_guest_first_name: Mapped[Optional[str]
+                                    ] = mapped_column(String(120), nullable=True)
+    airbnb_guest_last_name: Mapped[Optional[str]
+                                   ] = mapped_column(String(120), nullable=True)
+    airbnb_checkin: Mapped[Optional[datetime]
+                           ] = mapped_column(DateTime, nullable=True)
+    airbnb_checkout: Mapped[Optional[datetime]
+                            ] = mapped_column(DateTime, nullable=True, index=True)
+    reservation_url: Mapped[Optional[str]] = mapped_column(
+        String(1024), nullable=True)
+    airbnb_guestpic_url: Mapped[Optional[str]] = mapped_column(
+        String(1024), nullable=True)
+    needs_manual_details: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, default=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow)
+    airbnb_guestpic: Mapped[Optional[bytes]] = mapped_column(
+        LargeBinary, nullable=True)
+    phone_last4: Mapped[Optional[str]] = mapped_column(
+        String(4), nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_bookings_archive_listing_googleid",
+              "listing_id", "google_calendar_id"),
+    )
+    def __repr__(self) -> str:
+        return f"<BookingArchive {self.id} {self.google_calendar_id or ''}>"
+# ---- BookingEvent -----------------------------------------------------------
+class BookingEvent(db.Model):
+    """
+    Booking create/update/cancel events for the SSE stream. The id is the
+    global SSE event id; every worker relays new rows to its own clients
+    (api.events), and rows older than EVENT_RETENTION are pruned.
+    """
+    __tablename__ = "booking_events"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    # owner of the listing when the event was published; streams filter on it
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    listing_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    data: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow, index=True)
+    def __repr__(self) -> str:
+        return f"<BookingEvent {self.id} {self.kind}>"
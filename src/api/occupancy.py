@@ -0,0 +1,165 @@
+"""
+Keeps Listing.current_booking_id in step with check-in/checkout times.
+
+refresh() recomputes who is in each unit right now and loads a min-heap of
+the upcoming check-in/checkout transitions from bookings. advance() pops the
+transitions that are due and re-resolves only the listings they touch, so
+reading occupancy stays a plain query on the listings table.
+
+Booking.airbnb_checkout is the last night of a stay, so a guest is in the
+unit from checkin until CHECKOUT_TIME on the day after it.
+
+The heap is per process: every worker holds its own copy, all updates are
+idempotent, and the heap is reloaded after a sync and every REFRESH_INTERVAL.
+init_occupancy() starts a timer thread in each worker (on its first request)
+that calls advance() every OCCUPANCY_TICK_SECONDS, so current_booking_id is
+right for every reader, not only /api/listings/current-occupancy. Outside
+the web workers, `flask refresh-occupancy` does the same once.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select, update
+
+from api.models import db, departure_date, Booking, Listing
+
+REFRESH_INTERVAL = timedelta(minutes=10)
+TICK_SECONDS = float(os.getenv("OCCUPANCY_TICK_SECONDS", "60"))
+CHECKIN, CHECKOUT = 0, 1
+# local time guests leave on their departure day (DEFAULT_CHECKOUT_TIME=HH:MM)
+_hour, _minute = os.getenv("DEFAULT_CHECKOUT_TIME", "11:00").split(":")
+CHECKOUT_TIME = timedelta(hours=int(_hour), minutes=int(_minute))
+
+log = logging.getLogger(__name__)
+
+
+def checkout_at(last_night: datetime) -> datetime:
+    """When the guest whose last night is `last_night` leaves."""
+    return datetime.combine(departure_date(last_night).date(), datetime.min.time()) + CHECKOUT_TIME
+
+
+def still_staying_since(now: datetime) -> datetime:
+    """Bookings whose last night is >= this have not checked out by `now`."""
+    return datetime.combine((now - CHECKOUT_TIME).date(), datetime.min.time())
+
+
+def local_now() -> datetime:
+    """Naive wall-clock time in DEFAULT_TIMEZONE, matching how bookings are stored."""
+    import pytz
+    tz = pytz.timezone(os.getenv("DEFAULT_TIMEZONE", "America/New_York"))
+    return datetime.now(tz).replace(tzinfo=None)
+
+
+class OccupancyTimeline:
+    def __init__(self):
+        self._heap = []
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[datetime] = None
+        self._timer: Optional[threading.Thread] = None
+
+    def _resolve(self, now: datetime, listing_ids: Optional[Iterable[int]] = None) -> int:
+        """Set current_booking_id for the given listings (all when None). Returns rows changed."""
+        occupied = (
+            select(Booking.listing_id, Booking.id)
+            .where(Booking.listing_id.is_not(None),
+                   Booking.airbnb_checkin <= now,
+                   Booking.airbnb_checkout >= still_staying_since(now))
+            .order_by(Booking.listing_id, Booking.airbnb_checkin)
+        )
+        listings = select(Listing.id, Listing.current_booking_id)
+        if listing_ids is not None:
+            listing_ids = list(listing_ids)
+            occupied = occupied.where(Booking.listing_id.in_(listing_ids))
+            listings = listings.where(Listing.id.in_(listing_ids))
+        # later check-in wins if an owner double-booked the unit
+        current: Dict[int, int] = dict(db.session.execute(occupied).all())
+        changed = 0
+        for listing_id, booking_id in db.session.execute(listings).all():
+            wanted = current.get(listing_id)
+            if wanted != booking_id:
+                db.session.execute(
+                    update(Listing).where(Listing.id == listing_id)
+                    .values(current_booking_id=wanted))
+                changed += 1
+        return changed
+
+    def refresh(self, now: Optional[datetime] = None) -> int:
+        """Full recompute plus reload of the upcoming transitions. Commits."""
+        now = now or local_now()
+        with self._lock:
+            changed = self._resolve(now)
+            heap = []
+            rows = db.session.execute(
+                select(Booking.listing_id, Booking.airbnb_checkin, Booking.airbnb_checkout)
+                .where(Booking.listing_id.is_not(None),
+                       Booking.airbnb_checkout >= still_staying_since(now))
+            ).all()
+            for listing_id, checkin, last_night in rows:
+                if checkin is not None and checkin > now:
+                    heap.append((checkin, CHECKIN, listing_id))
+                heap.append((checkout_at(last_night), CHECKOUT, listing_id))
+            heapq.heapify(heap)
+            self._heap = heap
+            self._loaded_at = now
+            db.session.commit()
+        return changed
+
+    def advance(self, now: Optional[datetime] = None) -> int:
+        """Apply every transition that is due by `now`. Commits when something changed."""
+        now = now or local_now()
+        if self._loaded_at is None or now - self._loaded_at > REFRESH_INTERVAL:
+            return self.refresh(now)
+        with self._lock:
+            due = set()
+            while self._heap and self._heap[0][0] <= now:
+                due.add(heapq.heappop(self._heap)[2])
+            if not due:
+                return 0
+            changed = self._resolve(now, due)
+            db.session.commit()
+        return changed
+
+    @property
+    def running(self) -> bool:
+        return self._timer is not None and self._timer.is_alive()
+
+    def start(self, app, interval: float = TICK_SECONDS) -> None:
+        """Advance the timeline every `interval` seconds in a daemon thread (once per process)."""
+        with self._lock:
+            if self.running:
+                return
+            self._timer = threading.Thread(
+                target=self._run, args=(app, interval), name="occupancy-timer", daemon=True)
+            self._timer.start()
+
+    def _run(self, app, interval: float) -> None:
+        while True:
+            with app.app_context():
+                try:
+                    self.advance()
+                except Exception:
+                    log.exception("occupancy timer failed; retrying")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+
+timeline = OccupancyTimeline()
+
+
+def init_occupancy(app):
+    app.config.setdefault("OCCUPANCY_TICK_SECONDS", TICK_SECONDS)
+    interval = app.config["OCCUPANCY_TICK_SECONDS"]
+    if interval <= 0:
+        return
+
+    @app.before_request
+    def _start_occupancy_timer():
+        # started lazily so each gunicorn worker gets its own thread after the fork
+        if not timeline.running:
+            timeline.start(app, interval)
@@ -0,0 +1,175 @@
+"""
+On-demand request profiling.
+
+Off unless PROFILING_ENABLED is set. A request is then profiled with
+cProfile when either
+  - it carries `X-Profile: <PROFILING_TOKEN>` (explicit, only when a token
+    is configured), or
+  - it is picked by PROFILE_SAMPLE_RATE (0..1) and its path starts with
+    one of PROFILE_PATHS (comma separated, default /api/).
+At most PROFILE_MAX_PER_MINUTE profiles are taken per worker, and only one
+at a time (cProfile cannot nest). Each profile is written to PROFILE_DIR as
+<id>.prof (pstats) plus <id>.json metadata, shared by the workers on the
+host, and the oldest are pruned beyond PROFILE_KEEP. Admins read them
+through /api/admin/profiles.
+"""
+import cProfile
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from io import StringIO
+from typing import List, Optional
+from flask import g, request
+
+from api.ratelimit import MemoryStorage
+
+PROFILE_ID_CHARS = set("0123456789abcdef")
+_limiter = MemoryStorage()
+_active = threading.Lock()
+
+
+def _wanted(app) -> Optional[str]:
+    """'header' or 'sampled' when this request should be profiled, else None."""
+    token = app.config["PROFILING_TOKEN"]
+    if token and request.headers.get("X-Profile") == token:
+        reason = "header"
+    elif (app.config["PROFILE_SAMPLE_RATE"] > 0
+          and request.path.startswith(app.config["PROFILE_PATHS"])
+          and random.random() < app.config["PROFILE_SAMPLE_RATE"]):
+        reason = "sampled"
+    else:
+        return None
+    per_minute = app.config["PROFILE_MAX_PER_MINUTE"]
+    if _limiter.take("profile", per_minute / 60.0, float(per_minute), time.time()) > 0:
+        return None
+    return reason
+
+
+def _save(app, profiler, reason, response, elapsed) -> str:
+    directory = app.config["PROFILE_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    profiler.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+    meta = {
+        "id": profile_id,
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 2),
+        "reason": reason,
+        "pid": os.getpid(),
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    with open(os.path.join(directory, f"{profile_id}.json"), "w") as f:
+        json.dump(meta, f)
+    _prune(directory, app.config["PROFILE_KEEP"])
+    return profile_id
+
+
+def _prune(directory: str, keep: int) -> None:
+    metas = sorted(
+        (e for e in os.scandir(directory) if e.name.endswith(".json")),
+        key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in metas[keep:]:
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(entry.path[:-len(".json")] + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory: str) -> List[dict]:
+    """Saved profile metadata, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    out = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".json"):
+            try:
+                with open(entry.path) as f:
+                    out.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # pruned or half written by another worker
+    return sorted(out, key=lambda m: m["created_at"], reverse=True)
+
+
+def profile_path(directory: str, profile_id: str) -> Optional[str]:
+    """Path of the .prof file for an id, or None when the id is unknown."""
+    if not profile_id or not set(profile_id) <= PROFILE_ID_CHARS:
+        return None
+    path = os.path.join(directory, f"{profile_id}.prof")
+    return path if os.path.isfile(path) else None
+
+
+def top_functions(path: str, sort: str = "cumulative", limit: int = 40) -> dict:
+    """The heaviest functions of a saved profile plus pstats' text report."""
+    stats = pstats.Stats(path)
+    stats.sort_stats(sort)
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        calls, primitive, tottime, cumtime, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "primitive_calls": primitive,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        })
+    report = StringIO()
+    pstats.Stats(path, stream=report).sort_stats(sort).print_stats(limit)
+    return {"total_ms": round(stats.total_tt * 1000, 3), "functions": rows,
+            "report": report.getvalue()}
+
+
+def init_profiling(app):
+    app.config.setdefault("PROFILING_ENABLED", os.getenv("PROFILING_ENABLED", "").lower()
+                          in ("1", "true", "yes", "on"))
+    app.config.setdefault("PROFILING_TOKEN", os.getenv("PROFILING_TOKEN", ""))
+    app.config.setdefault("PROFILE_SAMPLE_RATE", float(os.getenv("PROFILE_SAMPLE_RATE", "0")))
+    app.config.setdefault("PROFILE_PATHS", tuple(
+        p.strip() for p in os.getenv("PROFILE_PATHS", "/api/").split(",") if p.strip()))
+    app.config.setdefault("PROFILE_MAX_PER_MINUTE", int(os.getenv("PROFILE_MAX_PER_MINUTE", "6")))
+    app.config.setdefault("PROFILE_KEEP", int(os.getenv("PROFILE_KEEP", "50")))
+    app.config.setdefault("PROFILE_DIR", os.getenv("PROFILE_DIR", "/tmp/profiles"))
+    if not app.config["PROFILING_ENABLED"]:
+        return
+
+    @app.before_request
+    def _start_profile():
+        reason = _wanted(app)
+        if reason is None or not _active.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler (e.g. a debugger) is attached
+            _active.release()
+            return
+        g._profile = (profiler, reason, time.perf_counter())
+
+    @app.after_request
+    def _finish_profile(response):
+        state = g.pop("_profile", None)
+        if state is None:
+            return response
+        profiler, reason, started = state
+        profiler.disable()
+        _active.release()
+        profile_id = _save(app, profiler, reason, response, time.perf_counter() - started)
+        response.headers["X-Profile-Id"] = profile_id
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        # after_request is skipped when the view raised
+        state = g.pop("_profile", None)
+        if state is not None:
+            state[0].disable()
+            _active.release()
@@ -0,0 +1,164 @@
+"""
+Token-bucket rate limiting and single-flight request coalescing.
+
+Buckets are keyed by JWT identity when a valid token is present, otherwise
+by client IP (request.remote_addr; behind a proxy set TRUSTED_PROXY_HOPS so
+ProxyFix rewrites it from X-Forwarded-For, see app.py). Storage is chosen with RATELIMIT_STORAGE_URL:
+  memory://                     per process (default)
+  sqlite:////tmp/ratelimit.db   shared by every worker on the host
+"""
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Tuple
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+
+class MemoryStorage:
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float, now: float) -> float:
+        """Consume one token. Returns 0 when allowed, else seconds until a token is free."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / rate
+
+
+class SQLiteStorage:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, capacity: float, now: float) -> float:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+def storage_from_url(url: str | None):
+    if not url or url.startswith("memory://"):
+        return MemoryStorage()
+    if url.startswith("sqlite:///"):
+        return SQLiteStorage(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported RATELIMIT_STORAGE_URL: {url}")
+
+
+storage = storage_from_url(os.getenv("RATELIMIT_STORAGE_URL"))
+
+
+def client_key() -> str:
+    """
+    JWT identity when the request carries a valid token, else the client IP.
+    Never read X-Forwarded-For here: clients can set it to anything.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    if identity is not None:
+        return f"user:{identity}"
+    return f"ip:{request.remote_addr}"
+
+
+def rate_limit(per_minute: int, burst: int | None = None):
+    """Allow `per_minute` requests per client with bursts up to `burst`; 429 otherwise."""
+    rate = per_minute / 60.0
+    capacity = float(burst or per_minute)
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = f"{fn.__name__}:{client_key()}"
+            wait = storage.take(key, rate, capacity, time.time())
+            if wait > 0:
+                resp = jsonify({"error": "rate limit exceeded"})
+                resp.headers["Retry-After"] = str(int(wait) + 1)
+                return resp, 429
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller runs fn,
+    callers arriving while it runs wait and get the same result (or error).
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+flight = SingleFlight()
@@ -1,19 +1,29 @@
 from __future__ import annotations
 
+import hmac
 import os
-import re
-import pytz
-import requests
-from datetime import datetime, date, timedelta, timezone
-from typing import List, Dict, Any
-from flask import Blueprint, current_app, jsonify, request
+import secrets
+from datetime import datetime, date
+from flask import Blueprint, Response, current_app, jsonify, request, send_file, url_for
 from flask_cors import CORS
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
-from sqlalchemy import select
-from icalendar import Calendar
+from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, verify_jwt_in_request
+from sqlalchemy import select, func, union_all
+from sqlalchemy.orm import selectinload
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from api.models import db, User, Listing, Booking
+from api.models import db, User, Listing, Booking, BookingArchive, ListingStat, SyncJob
+from api.stats import apply_booking_change, span_of
+from api.archive import archive_needed
+from api.ics_feed import DEFAULT_TZ, fetch_reserved_rows
+from api.sync import enqueue_sync_job, sync_listing
+from api.occupancy import timeline
+from api.events import broker
+from api.search import search as search_index
+from api.geocoding import listing_coords
+from api.ical import calendar_cache, write_calendar
+from api.profiling import list_profiles, profile_path, top_functions
+from api.utils import weak_etag, collection_version, row_version, not_modified, with_validators, admin_required
+from api.ratelimit import rate_limit, flight
 
 api = Blueprint("api", __name__)
 CORS(api, supports_credentials=True, origins="*")
@@ -81,16 +91,22 @@ def protect_preview():
 
 
 @api.route("/admin/users", methods=["GET"])
+@admin_required
 def list_all_users():
     """
     Get all users in the database. Requires authentication.
     Returns user info without sensitive data like passwords.
     """
-    users = User.query.all()
-    return jsonify({
-        "total_users": len(users),
-        "users": [user.serialize() for user in users]
-    }), 200
+    etag, last_modified = collection_version(db.session, User)
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    rows = db.session.execute(select(*User.serialize_columns())).all()
+    resp = jsonify({
+        "total_users": len(rows),
+        "users": [User.serialize_row(r) for r in rows]
+    })
+    return with_validators(resp, etag, last_modified), 200
 
 
 @api.route("/hello", methods=["GET"])
@@ -99,168 +115,13 @@ def handle_hello():
         "message": "Hello! I'm a message that came from the backend. Check the network tab."
     }), 200
 
-# -----------------------------
-# Calendar (ICS) parsing + JSON exposure (Jose2 ENHANCED)
-# -----------------------------
-
-
-def _env(name: str, default: str | None = None) -> str | None:
-    return os.environ.get(name, default)
-
-
-RESERVATIONS_ICS_URL = _env("RESERVATIONS_ICS_URL") or (
-    "https://calendar.google.com/calendar/ical/"
-    "r2jpg8uh13234dsjiducroruahlv7i2r%40import.calendar.google.com/public/basic.ics"
-)
-DEFAULT_TZ = _env("DEFAULT_TIMEZONE", "America/New_York")
-
-# --- URL helpers -------------------------------------------------------------
-RE_URL = re.compile(r"(https?://[^\s)]+)", re.I)
-RE_EXT_IMAGE = re.compile(r"\.(?:png|jpe?g|webp|gif)(?:\?.*)?$", re.I)
-RE_DRIVE_FILE_VIEW = re.compile(
-    r"https?://drive\.google\.com/file/d/([^/]+)/view(?:\?[^ ]*)?", re.I)
-RE_DRIVE_OPEN = re.compile(
-    r"https?://drive\.google\.com/open\?id=([^&]+)", re.I)
-RE_DRIVE_UC = re.compile(
-    r"https?://drive\.google\.com/uc\?(?:export=\w+&)?id=([^&]+)", re.I)
-
-
-def to_direct_image_url(url: str) -> str:
-    """
-    Convert known providers (Google Drive) to a direct image URL.
-    If it already looks like an image or a direct-drive link, return as-is/converted.
-    """
-    if not url:
-        return url
-
-    # Google Drive conversions
-    m = RE_DRIVE_FILE_VIEW.search(url) or RE_DRIVE_OPEN.search(
-        url) or RE_DRIVE_UC.search(url)
-    if m:
-        file_id = m.group(1)
-        return f"https://drive.google.com/uc?export=view&id={file_id}"
-
-    # Otherwise, if it looks like a normal image (by extension), return as is
-    if RE_EXT_IMAGE.search(url):
-        return url
-
-    # Fallback: return original (may still work if server responds with image content-type)
-    return url
-
-
-def _to_tz(dt, tzname):
-    """
-    Convert a datetime to the specified timezone.
-    If dt is a date (not datetime), convert it to a datetime at midnight.
-    """
-    if not dt:
-        return dt
-
-    # If it's a date, convert to datetime at midnight
-    if isinstance(dt, date) and not isinstance(dt, datetime):
-        dt = datetime.combine(dt, datetime.min.time())
-
-    # If it's naive, assume UTC
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-
-    # Convert to target timezone
-    target_tz = pytz.timezone(tzname)
-    return dt.astimezone(target_tz)
-
-# --- Datetime helpers --------------------------------------------------------
-
-
-def _to_tz(dt, tzname: str):
-    tz = pytz.timezone(tzname)
-    if isinstance(dt, datetime):
-        if dt.tzinfo is None:
-            return tz.localize(dt)
-        return dt.astimezone(tz)
-    return tz.localize(datetime(dt.year, dt.month, dt.day, 0, 0, 0))
-
-
-def _fix_all_day_checkout(start, end):
-    if isinstance(start, datetime) or isinstance(end, datetime):
-        return end
-    return end - timedelta(days=1)
-
-# --- Image extraction --------------------------------------------------------
-
-
-def _first_image_from_vevent(vevent) -> str | None:
-    """
-    Extract an image URL from an event via:
-      1) ATTACH property (may be one or many)
-      2) Any URL in DESCRIPTION (first match)
-    For Google Drive links, convert to a direct-view URL.
-    """
-    # 1) ATTACH
-    attach = vevent.get("attach")
-    if attach:
-        cands = attach if isinstance(attach, list) else [attach]
-        for a in cands:
-            url = to_direct_image_url(str(a))
-            if url:
-                return url
-
-    # 2) DESCRIPTION scan for any URL
-    desc = str(vevent.get("description") or "")
-    m = RE_URL.search(desc)
-    if m:
-        return to_direct_image_url(m.group(1))
-
-    return None
-
-# --- Core ICS parsing --------------------------------------------------------
-
-
-def _fetch_reserved_rows(tzname: str = DEFAULT_TZ) -> List[Dict[str, Any]]:
-    if not RESERVATIONS_ICS_URL:
-        raise RuntimeError("RESERVATIONS_ICS_URL is not configured")
-    resp = requests.get(RESERVATIONS_ICS_URL, timeout=30)
-    resp.raise_for_status()
-    cal = Calendar.from_ical(resp.content)
-    rows: List[Dict[str, Any]] = []
-    for vevent in cal.walk("vevent"):
-        summary = str(vevent.get("summary") or "")
-        if "reserved" not in summary.lower():
-            continue
-        uid = str(vevent.get("uid") or "").strip()
-        if not uid:
-            continue
-        dtstart = vevent.get("dtstart") and vevent.get("dtstart").dt
-        dtend = vevent.get("dtend") and vevent.get("dtend").dt
-        if not dtstart or not dtend:
-            continue
-        start_local = _to_tz(dtstart, tzname)
-        end_local = _to_tz(dtend, tzname)
-        checkout_display = end_local
-        if not isinstance(dtstart, datetime) and not isinstance(dtend, datetime):
-            checkout_display = _to_tz(
-                _fix_all_day_checkout(dtstart, dtend), tzname)
-        desc = str(vevent.get("description") or "")
-        m_url = RE_URL.search(desc)
-        reservation_url = m_url.group(1) if m_url else None
-        image_url = _first_image_from_vevent(vevent)
-        rows.append({
-            "event": uid,
-            "title": summary.strip(),
-            "checkin": start_local.isoformat(),
-            "checkout": checkout_display.isoformat(),
-            "reservation_url": reservation_url,
-            "image": image_url,
-        })
-    rows.sort(key=lambda x: x["checkin"])
-    return rows
-
-
 @api.route("/calendar/reserved", methods=["GET"])
 @jwt_required()
+@rate_limit(per_minute=30, burst=10)
 def calendar_reserved():
     tzname = request.args.get("tz") or DEFAULT_TZ
     try:
-        rows = _fetch_reserved_rows(tzname)
+        rows = fetch_reserved_rows(tzname)
         return jsonify(rows), 200
     except Exception as e:
         current_app.logger.exception("calendar_reserved failed: %s", e)
@@ -271,12 +132,25 @@ def calendar_reserved():
 
 
 @api.route("/admin/sync-reserved", methods=["POST"])
+@admin_required
+@rate_limit(per_minute=6, burst=2)
 def sync_reserved_to_db():
     """
     Upsert ICS 'Reserved' rows into bookings for a listing.
     Accepts JSON or query param: { "listing_id": 1 }
     Uses env RESERVATIONS_LISTING_ID if not provided.
     """
+    listing_id, error = _requested_listing_id()
+    if error:
+        return error
+    # a second trigger for the same listing while one runs gets its result
+    result = flight.do(("sync-reserved", listing_id),
+                       lambda: sync_listing(listing_id))
+    return jsonify(result), 200
+
+
+def _requested_listing_id():
+    """listing_id from JSON body, query string or RESERVATIONS_LISTING_ID, validated."""
     listing_id = None
     if request.is_json:
         listing_id = request.json.get("listing_id")
@@ -285,72 +159,261 @@ def sync_reserved_to_db():
             "listing_id") or os.getenv("RESERVATIONS_LISTING_ID")
 
     if not listing_id:
-        return jsonify({"error": "listing_id required"}), 400
+        return None, (jsonify({"error": "listing_id required"}), 400)
     try:
         listing_id = int(listing_id)
     except Exception:
-        return jsonify({"error": "listing_id must be an integer"}), 400
+        return None, (jsonify({"error": "listing_id must be an integer"}), 400)
     # Ensure listing exists
     if not db.session.get(Listing, listing_id):
-        return jsonify({"error": f"listing_id {listing_id} not found"}), 404
-    rows = _fetch_reserved_rows()
-    created = updated = 0
-    for r in rows:
-        uid = r["event"]
-        ci = date.fromisoformat(r["checkin"][:10])
-        co = date.fromisoformat(r["checkout"][:10])
-        booking = db.session.execute(
-            select(Booking).where(
-                Booking.listing_id == listing_id,
-                Booking.google_calendar_id == uid
-            )
-        ).scalar_one_or_none()
-        if booking is None:
-            booking = Booking(
-                listing_id=listing_id,
-                google_calendar_id=uid,
-                needs_manual_details=True
-            )
-            db.session.add(booking)
-            created += 1
-        else:
-            updated += 1
-        booking.airbnb_checkin = ci
-        booking.airbnb_checkout = co
-        booking.reservation_url = r.get("reservation_url")
-        booking.phone_last4 = r.get("phone_last4")
-        booking.airbnb_guestpic_url = r.get("image")
-    db.session.commit()
-    return jsonify({"ok": True, "created": created, "updated": updated}), 200
+        return None, (jsonify({"error": f"listing_id {listing_id} not found"}), 404)
+    return listing_id, None
+
+
 # ------------------------------------------------
-# Admin: manually punch guest names and profile pic
+# Admin: background sync jobs
 # ------------------------------------------------
 
 
-@api.route("/admin/bookings/<int:booking_id>", methods=["PATCH"])
-def admin_update_booking(booking_id: int):
-    b = db.session.get(Booking, booking_id)
-    if not b:
+@api.route("/admin/sync-jobs", methods=["POST"])
+@admin_required
+@rate_limit(per_minute=6, burst=2)
+def create_sync_job():
+    """
+    Enqueue an ICS sync for a listing and return immediately with the job.
+    Same inputs as /admin/sync-reserved. A trigger while a job for the
+    listing is queued/running returns that job (200) instead of a new one (202).
+    """
+    listing_id, error = _requested_listing_id()
+    if error:
+        return error
+    job, created = enqueue_sync_job(listing_id)
+    resp = jsonify(job.serialize())
+    resp.headers["Location"] = f"{request.script_root}/api/admin/sync-jobs/{job.id}"
+    return resp, 202 if created else 200
+
+
+@api.route("/admin/sync-jobs/<int:job_id>", methods=["GET"])
+@admin_required
+def get_sync_job(job_id: int):
+    job = db.session.get(SyncJob, job_id)
+    if not job:
         return jsonify({"error": "not found"}), 404
-    data = request.get_json(silent=True) or {}
+    return jsonify(job.serialize()), 200
+# ------------------------------------------------
+# Admin: request profiles (see api.profiling)
+# ------------------------------------------------
+
+
+@api.route("/admin/profiles", methods=["GET"])
+@admin_required
+def admin_list_profiles():
+    return jsonify({
+        "enabled": current_app.config["PROFILING_ENABLED"],
+        "profiles": list_profiles(current_app.config["PROFILE_DIR"]),
+    }), 200
+
+
+@api.route("/admin/profiles/<profile_id>", methods=["GET"])
+@admin_required
+def admin_get_profile(profile_id: str):
+    """
+    ?format=json (default): top functions, ?sort=cumulative|tottime|calls, ?limit=40
+    ?format=pstats: the raw profile, for `python -m pstats` or snakeviz
+    """
+    path = profile_path(current_app.config["PROFILE_DIR"], profile_id)
+    if path is None:
+        return jsonify({"error": "not found"}), 404
+    if request.args.get("format") == "pstats":
+        return send_file(path, mimetype="application/octet-stream",
+                         as_attachment=True, download_name=f"{profile_id}.prof")
+    sort = request.args.get("sort", "cumulative")
+    if sort not in ("cumulative", "tottime", "calls"):
+        return jsonify({"error": "sort must be cumulative, tottime or calls"}), 400
+    limit = min(max(request.args.get("limit", 40, type=int), 1), 500)
+    return jsonify({"id": profile_id, **top_functions(path, sort, limit)}), 200
+# ------------------------------------------------
+# Admin: manually punch guest names and profile pic
+# ------------------------------------------------
+
+
+MAX_BULK_UPDATES = 500
+# editable text fields and their column lengths
+BOOKING_TEXT_FIELDS = {"first_name": 120, "last_name": 120, "guestpic_url": 1024}
+
+
+def _booking_update_error(data) -> str | None:
+    """Why an admin update payload is invalid, or None when it can be applied."""
+    if not isinstance(data, dict):
+        return "update must be an object"
+    for field, max_len in BOOKING_TEXT_FIELDS.items():
+        value = data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            return f"{field} must be a string or null"
+        if len(value.strip()) > max_len:
+            return f"{field} must be at most {max_len} characters"
+    if "listing_id" in data:
+        value = data["listing_id"]
+        if isinstance(value, bool) or _parse_listing_id(data) is None \
+                or (isinstance(value, float) and not value.is_integer()):
+            return "listing_id must be an integer"
+    return None
+
+
+def _parse_listing_id(data: dict):
+    """The listing_id of an update as an int, or None when absent/invalid."""
+    try:
+        return int(data["listing_id"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _apply_booking_update(b: Booking, data: dict, known_listing_ids) -> None:
+    """Apply one admin update in place; listing ids not in known_listing_ids are ignored."""
     if "first_name" in data:
         b.airbnb_guest_first_name = (data["first_name"] or "").strip() or None
     if "last_name" in data:
         b.airbnb_guest_last_name = (data["last_name"] or "").strip() or None
     if "guestpic_url" in data:
         b.airbnb_guestpic_url = (data["guestpic_url"] or "").strip() or None
-    if "listing_id" in data:
-        try:
-            new_listing_id = int(data["listing_id"])
-            if db.session.get(Listing, new_listing_id):
-                b.listing_id = new_listing_id
-        except Exception:
-            pass
+    new_listing_id = _parse_listing_id(data)
+    if new_listing_id in known_listing_ids:
+        b.listing_id = new_listing_id
     # Mark complete if both names are present (tweak rule as desired)
     if b.airbnb_guest_first_name and b.airbnb_guest_last_name:
         b.needs_manual_details = False
+
+
+@api.route("/admin/bookings/<int:booking_id>", methods=["PATCH"])
+@admin_required
+def admin_update_booking(booking_id: int):
+    b = db.session.get(Booking, booking_id)
+    if not b:
+        return jsonify({"error": "not found"}), 404
+    data = request.get_json(silent=True) or {}
+    error = _booking_update_error(data)
+    if error:
+        return jsonify({"error": error}), 400
+    before = span_of(b)
+    new_listing_id = _parse_listing_id(data)
+    known = set()
+    if new_listing_id is not None and db.session.get(Listing, new_listing_id):
+        known.add(new_listing_id)
+    _apply_booking_update(b, data, known)
+    after = span_of(b)
+    apply_booking_change(before, after)
+    db.session.commit()
+    payload = b.serialize()
+    broker.publish("update", payload)
+    if before != after:
+        timeline.refresh()
+    etag, last_modified = row_version(b)
+    return with_validators(jsonify(payload), etag, last_modified), 200
+
+
+@api.route("/admin/bookings", methods=["PATCH"])
+@admin_required
+def admin_bulk_update_bookings():
+    """
+    Apply many guest-detail updates in one transaction.
+    Body: {"updates": [{"id": 1, "first_name": "...", "last_name": "...",
+                        "guestpic_url": "...", "listing_id": 2}, ...]}
+    Bookings and listing ids are each loaded with one query. Every item gets
+    a result; invalid items (bad field types, unknown booking or listing)
+    are skipped with a 400/404 result and the rest are committed together.
+    """
+    data = request.get_json(silent=True) or {}
+    updates = data.get("updates") if isinstance(data, dict) else data
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"error": "updates must be a non-empty list"}), 400
+    if len(updates) > MAX_BULK_UPDATES:
+        return jsonify({"error": f"at most {MAX_BULK_UPDATES} updates per request"}), 400
+    ids = []
+    for item in updates:
+        try:
+            ids.append(int(item["id"]))
+        except (KeyError, TypeError, ValueError):
+            ids.append(None)
+    bookings = {
+        b.id: b for b in db.session.execute(
+            select(Booking).where(Booking.id.in_({i for i in ids if i is not None}))
+        ).scalars()
+    }
+    wanted_listings = {_parse_listing_id(item) for item in updates if isinstance(item, dict)}
+    wanted_listings.discard(None)
+    known_listings = set(db.session.execute(
+        select(Listing.id).where(Listing.id.in_(wanted_listings))).scalars()) if wanted_listings else set()
+
+    results, changed, moved = [], [], False
+    with db.session.no_autoflush:
+        for booking_id, item in zip(ids, updates):
+            if booking_id is None:
+                results.append({"id": None, "status": 400, "error": "id must be an integer"})
+                continue
+            b = bookings.get(booking_id)
+            if b is None:
+                results.append({"id": booking_id, "status": 404, "error": "not found"})
+                continue
+            error = _booking_update_error(item)
+            if error:
+                results.append({"id": booking_id, "status": 400, "error": error})
+                continue
+            listing_id = _parse_listing_id(item)
+            if "listing_id" in item and listing_id not in known_listings:
+                results.append({"id": booking_id, "status": 400, "error": "unknown listing_id"})
+                continue
+            before = span_of(b)
+            _apply_booking_update(b, item, known_listings)
+            after = span_of(b)
+            apply_booking_change(before, after)
+            moved = moved or before != after
+            changed.append(b)
+            results.append({"id": booking_id, "status": 200})
     db.session.commit()
-    return jsonify(b.serialize()), 200
+    payloads = {b.id: b.serialize() for b in changed}
+    broker.publish_many(("update", payload) for payload in payloads.values())
+    for result in results:
+        if result["status"] == 200:
+            result["booking"] = payloads[result["id"]]
+    if moved:
+        timeline.refresh()
+    return jsonify({"updated": len(payloads), "results": results}), 200
+
+
+@api.route("/admin/bookings", methods=["GET"])
+@admin_required
+def admin_list_bookings():
+    """
+    Bookings ordered by check-in for admin back-filling, paginated with
+    ?page=&per_page=. ?needs_manual_details=true is the work queue and is
+    served from ix_bookings_manual_queue.
+    """
+    paging = _pagination()
+    if paging is None:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+    page, per_page = paging
+    criteria = []
+    flag = request.args.get("needs_manual_details")
+    if flag is not None:
+        criteria.append(Booking.needs_manual_details ==
+                        (flag.strip().lower() in ("1", "true", "yes")))
+    total = db.session.execute(
+        select(func.count()).select_from(Booking).where(*criteria)).scalar_one()
+    rows = db.session.execute(
+        select(*Booking.serialize_columns())
+        .where(*criteria)
+        .order_by(Booking.airbnb_checkin, Booking.id)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    ).all()
+    return jsonify({
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "bookings": [Booking.serialize_row(r) for r in rows],
+    }), 200
 # -----------------------------
 # Public bookings read API
 # -----------------------------
@@ -363,37 +426,332 @@ def list_bookings():
       ?listing_id=1
       ?start=YYYY-MM-DD   (returns bookings whose checkout >= start)
       ?end=YYYY-MM-DD     (returns bookings whose checkin  <= end)
+    Responses carry a weak ETag; pollers sending If-None-Match get a 304
+    after a single count/max(updated_at) query.
+    bookings_archive is read too, but only when start is missing or falls
+    on or before the newest archived checkout.
     """
-    q = select(Booking)
     listing_id = request.args.get("listing_id")
     start = request.args.get("start")
     end = request.args.get("end")
     if listing_id:
         try:
-            q = q.where(Booking.listing_id == int(listing_id))
+            listing_id = int(listing_id)
         except Exception:
             return jsonify({"error": "listing_id must be an integer"}), 400
-    if start:
-        s = date.fromisoformat(start)
-        q = q.where(Booking.airbnb_checkout >= s)
-    if end:
-        e = date.fromisoformat(end)
-        q = q.where(Booking.airbnb_checkin <= e)
-    items = db.session.execute(q).scalars().all()
-    return jsonify([b.serialize() for b in items]), 200
+    s = date.fromisoformat(start) if start else None
+    e = date.fromisoformat(end) if end else None
+
+    def criteria(model):
+        out = []
+        if listing_id:
+            out.append(model.listing_id == listing_id)
+        if s:
+            out.append(model.airbnb_checkout >= s)
+        if e:
+            out.append(model.airbnb_checkin <= e)
+        return out
+
+    models = [Booking, BookingArchive] if archive_needed(s) else [Booking]
+    versions = [collection_version(db.session, m, *criteria(m)) for m in models]
+    etag = versions[0][0] if len(versions) == 1 else weak_etag(*[v[0] for v in versions])
+    last_modified = max((v[1] for v in versions if v[1] is not None), default=None)
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    rows = db.session.execute(union_all(*[
+        select(*m.serialize_columns()).where(*criteria(m)) for m in models
+    ])).all()
+    resp = jsonify([Booking.serialize_row(r) for r in rows])
+    return with_validators(resp, etag, last_modified), 200
+@api.route("/bookings/stream", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+def stream_bookings():
+    """
+    Server-sent events for booking create/update/cancel on the caller's
+    listings. EventSource can't set headers, so the JWT may also be passed
+    as ?jwt=. Optional: ?listing_id=1 (must be owned), resume with the
+    Last-Event-ID header (or ?last_event_id= for clients that can't set headers).
+    """
+    try:
+        # not args.get(type=int): that turns ?listing_id=abc into None, i.e. every listing
+        listing_id = request.args.get("listing_id")
+        listing_id = int(listing_id) if listing_id is not None else None
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "listing_id and Last-Event-ID must be integers"}), 400
+    if listing_id is not None and _owned_listing(listing_id) is None:
+        return jsonify({"error": f"listing_id {listing_id} not found"}), 404
+    user_id = int(get_jwt_identity())
+    db.session.remove()  # don't hold a pooled connection for the life of the stream
+    broker.start(current_app._get_current_object())
+    if not broker.acquire_stream():
+        # every stream holds a worker thread; keep some for normal requests
+        resp = Response("retry: 10000\n\n", status=503, mimetype="text/event-stream")
+        resp.headers["Retry-After"] = "10"
+        return resp
+    resp = Response(
+        broker.stream(user_id, last_event_id, listing_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    resp.call_on_close(broker.release_stream)
+    return resp
+# -----------------------------
+# Listings (owner scoped)
+# -----------------------------
+MAX_PER_PAGE = 200
+
+
+def _pagination():
+    """Read ?page=&per_page= (1-based page, per_page capped at MAX_PER_PAGE)."""
+    try:
+        page = max(int(request.args.get("page", 1)), 1)
+        per_page = min(max(int(request.args.get("per_page", 50)), 1), MAX_PER_PAGE)
+    except ValueError:
+        return None
+    return page, per_page
+
+
+@api.route("/listings", methods=["GET"])
+@jwt_required()
+def list_listings():
+    """
+    Listings owned by the JWT user, each with its current booking inlined.
+    Always three queries (count, listings page, current bookings via
+    selectinload) regardless of page size.
+    """
+    paging = _pagination()
+    if paging is None:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+    page, per_page = paging
+    owned = Listing.user_id == int(get_jwt_identity())
+    total = db.session.execute(
+        select(func.count()).select_from(Listing).where(owned)).scalar_one()
+    listings = db.session.execute(
+        select(Listing)
+        .where(owned)
+        .order_by(Listing.id)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+        .options(selectinload(Listing.current_booking))
+    ).scalars().all()
+    return jsonify({
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "listings": [
+            {**l.serialize(),
+             "current_booking": l.current_booking.serialize() if l.current_booking else None}
+            for l in listings
+        ],
+    }), 200
+@api.route("/listings/current-occupancy", methods=["GET"])
+@jwt_required()
+def current_occupancy():
+    """
+    Which of the caller's units are occupied right now. Reads only the
+    listings table; the timeline job keeps current_booking_id up to date.
+    """
+    timeline.advance()
+    rows = db.session.execute(
+        select(Listing.id, Listing.name, Listing.current_booking_id)
+        .where(Listing.user_id == int(get_jwt_identity()))
+        .order_by(Listing.id)
+    ).all()
+    return jsonify([
+        {"listing_id": lid, "name": name, "current_booking_id": bid,
+         "occupied": bid is not None}
+        for lid, name, bid in rows
+    ]), 200
+# -----------------------------
+# Listing stats (occupancy per month)
+# -----------------------------
+
+
+def _parse_month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+@api.route("/listings/<int:listing_id>/stats", methods=["GET"])
+@jwt_required()
+def listing_stats(listing_id: int):
+    """
+    Monthly occupancy for one of the caller's listings, read from the
+    listing_stats aggregate table (O(months), not O(bookings)).
+    Optional filters:
+      ?start=YYYY-MM  ?end=YYYY-MM   (inclusive)
+    """
+    listing = db.session.get(Listing, listing_id)
+    if not listing or str(listing.user_id) != str(get_jwt_identity()):
+        return jsonify({"error": "not found"}), 404
+    criteria = [ListingStat.listing_id == listing_id]
+    try:
+        if request.args.get("start"):
+            criteria.append(ListingStat.month >= _parse_month(request.args["start"]))
+        if request.args.get("end"):
+            criteria.append(ListingStat.month <= _parse_month(request.args["end"]))
+    except ValueError:
+        return jsonify({"error": "start/end must be YYYY-MM"}), 400
+    etag, last_modified = collection_version(db.session, ListingStat, *criteria)
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    stats = db.session.execute(
+        select(ListingStat).where(*criteria).order_by(ListingStat.month)
+    ).scalars().all()
+    resp = jsonify({"listing_id": listing_id,
+                   "months": [m.serialize() for m in stats]})
+    return with_validators(resp, etag, last_modified), 200
+# -----------------------------
+# Listing calendar export (iCal)
+# -----------------------------
+
+
+@api.route("/listings/<int:listing_id>/calendar.ics", methods=["GET"])
+def listing_calendar(listing_id: int):
+    """
+    The listing's bookings as an iCalendar feed for channel managers.
+    Requires ?token=<calendar_token> (see /listings/<id>/calendar-url);
+    unknown listings and wrong tokens both get a 404.
+    A poll is one aggregate query: 304 when the client's ETag is current,
+    otherwise the cached feed for this version (rendered on first miss).
+    """
+    token = request.args.get("token", "")
+    version = db.session.execute(
+        select(Listing.calendar_token, Listing.name,
+               func.count(Booking.id), func.max(Booking.updated_at))
+        .select_from(Listing)
+        .outerjoin(Booking, Booking.listing_id == Listing.id)
+        .where(Listing.id == listing_id)
+        .group_by(Listing.id, Listing.calendar_token, Listing.name)
+    ).first()
+    if version is None or not hmac.compare_digest(version[0].encode(), token.encode()):
+        return jsonify({"error": "not found"}), 404
+    _, name, count, last_modified = version
+    etag = weak_etag("calendar", listing_id, name, count, last_modified)
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    body = calendar_cache.get(listing_id, etag)
+    if body is None:
+        rows = db.session.execute(
+            select(Booking.id, Booking.google_calendar_id, Booking.airbnb_checkin,
+                   Booking.airbnb_checkout, Booking.updated_at)
+            .where(Booking.listing_id == listing_id)
+            .order_by(Booking.airbnb_checkin, Booking.id)
+            .execution_options(yield_per=500)
+        )
+        body = "".join(write_calendar(name or f"Listing {listing_id}", rows)).encode("utf-8")
+        calendar_cache.put(listing_id, etag, body)
+    resp = Response(body, mimetype="text/calendar")
+    resp.headers["Content-Disposition"] = f'inline; filename="listing-{listing_id}.ics"'
+    return with_validators(resp, etag, last_modified), 200
+
+
+def _owned_listing(listing_id: int):
+    listing = db.session.get(Listing, listing_id)
+    if not listing or str(listing.user_id) != str(get_jwt_identity()):
+        return None
+    return listing
+
+
+def _calendar_url_payload(listing: Listing) -> dict:
+    return {
+        "listing_id": listing.id,
+        "calendar_url": url_for("api.listing_calendar", listing_id=listing.id,
+                                token=listing.calendar_token, _external=True),
+    }
+
+
+@api.route("/listings/<int:listing_id>/calendar-url", methods=["GET"])
+@jwt_required()
+def listing_calendar_url(listing_id: int):
+    """The secret iCal export URL to paste into a channel manager (owner only)."""
+    listing = _owned_listing(listing_id)
+    if listing is None:
+        return jsonify({"error": "not found"}), 404
+    return jsonify(_calendar_url_payload(listing)), 200
+
+
+@api.route("/listings/<int:listing_id>/calendar-url", methods=["POST"])
+@jwt_required()
+def rotate_listing_calendar_url(listing_id: int):
+    """Issue a new export token; the previous URL stops working immediately."""
+    listing = _owned_listing(listing_id)
+    if listing is None:
+        return jsonify({"error": "not found"}), 404
+    listing.calendar_token = secrets.token_urlsafe(24)
+    db.session.commit()
+    return jsonify(_calendar_url_payload(listing)), 200
+# -----------------------------
+# Search
+# -----------------------------
+
+
+@api.route("/search", methods=["GET"])
+@jwt_required()
+def search():
+    """
+    Prefix search over the caller's bookings (guest first/last name) and
+    listings (name, street, city, state, address, zipcode).
+      ?q=ann smi   every term must match the start of a word
+      ?limit=20    per result type, max 100
+    """
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "q required"}), 400
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    return jsonify(search_index(q, int(get_jwt_identity()), limit)), 200
+# -----------------------------
+# Location helpers (weather / restaurants)
+# -----------------------------
+
+
+def _request_coords():
+    """
+    (latitude, longitude, error) from ?latitude=&longitude= or ?listing_id=,
+    the latter using the listing's stored/cached geocode. Coordinates are
+    public; a listing_id needs a JWT and only resolves the caller's own
+    listings, so the endpoints can't be used to locate other hosts' units.
+    """
+    listing_id = request.args.get('listing_id')
+    if listing_id:
+        verify_jwt_in_request()
+        try:
+            listing = _owned_listing(int(listing_id))
+        except ValueError:
+            return None, None, (jsonify({"error": "listing_id must be an integer"}), 400)
+        if not listing:
+            return None, None, (jsonify({"error": f"listing_id {listing_id} not found"}), 404)
+        try:
+            coords = listing_coords(listing)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning("geocoding listing %s failed: %s", listing_id, e)
+            return None, None, (jsonify({"error": "Geocoding service unavailable"}), 502)
+        if not coords:
+            return None, None, (jsonify({"error": "Could not geocode listing address"}), 422)
+        return str(coords[0]), str(coords[1]), None
+    latitude = request.args.get('latitude')
+    longitude = request.args.get('longitude')
+    if not latitude or not longitude:
+        return None, None, (jsonify({"error": "Latitude and longitude are required"}), 400)
+    return latitude, longitude, None
 # -----------------------------
 # Restaurant endpoints
 # -----------------------------
 
 
 @api.route("/restaurants/nearby", methods=["GET"])
+@rate_limit(per_minute=30, burst=10)
 def get_nearby_restaurants():
-    """Get nearby restaurants using Yelp API"""
-    latitude = request.args.get('latitude')
-    longitude = request.args.get('longitude')
+    """Get nearby restaurants using Yelp API (?latitude=&longitude=, or ?listing_id= with a JWT)"""
+    latitude, longitude, error = _request_coords()
+    if error:
+        return error
     radius = request.args.get('radius', 5000)  # Default 5km radius
-    if not latitude or not longitude:
-        return jsonify({"error": "Latitude and longitude are required"}), 400
     yelp_api_key = os.getenv('YELP_API_KEY')
     if not yelp_api_key:
         return jsonify({"error": "Yelp API key not configured"}), 500
@@ -409,12 +767,16 @@ def get_nearby_restaurants():
         'offset': 2,
         'sort_by': 'distance'
     }
+    import requests
     try:
-        response = requests.get(
-            'https://api.yelp.com/v3/businesses/search',
-            headers=headers,
-            params=params
-        )
+        response = flight.do(
+            ("yelp", latitude, longitude, radius),
+            lambda: requests.get(
+                'https://api.yelp.com/v3/businesses/search',
+                headers=headers,
+                params=params,
+                timeout=10
+            ))
         if response.status_code == 200:
             data = response.json()
             return jsonify(data), 200
@@ -429,12 +791,12 @@ def get_nearby_restaurants():
 
 
 @api.route("/weather/current", methods=["GET"])
+@rate_limit(per_minute=30, burst=10)
 def get_current_weather():
-    """Get current weather using WeatherAPI.com"""
-    latitude = request.args.get('latitude')
-    longitude = request.args.get('longitude')
-    if not latitude or not longitude:
-        return jsonify({"error": "Latitude and longitude are required"}), 400
+    """Get current weather using WeatherAPI.com (?latitude=&longitude=, or ?listing_id= with a JWT)"""
+    latitude, longitude, error = _request_coords()
+    if error:
+        return error
     weather_api_key = os.getenv('WEATHER_API_KEY')
     if not weather_api_key:
         return jsonify({"error": "Weather API key not configured"}), 500
@@ -442,11 +804,15 @@ def get_current_weather():
         'key': weather_api_key,
         'q': f"{latitude},{longitude}"
     }
+    import requests
     try:
-        response = requests.get(
-            'http://api.weatherapi.com/v1/current.json',
-            params=params
-        )
+        response = flight.do(
+            ("weather", latitude, longitude),
+            lambda: requests.get(
+                'http://api.weatherapi.com/v1/current.json',
+                params=params,
+                timeout=10
+            ))
         if response.status_code == 200:
             data = response.json()
             # Compose a simple weather string for the frontend
@@ -0,0 +1,182 @@
+"""
+Prefix search over guest names (bookings) and listing addresses.
+
+PostgreSQL: expression GIN indexes on to_tsvector('simple', ...) queried
+with prefix tsqueries (term:*) and ranked with ts_rank.
+SQLite: external-content FTS5 tables kept in sync by triggers, queried with
+"term"* and ranked with bm25(). Both are created by migration; on SQLite
+ensure_sqlite_fts() also creates them on first use for databases built with
+db.create_all().
+Other dialects fall back to an unindexed LIKE 'term%' scan.
+"""
+import re
+import threading
+from typing import Dict, List
+from sqlalchemy import and_, column, func, literal_column, or_, select, table, text
+
+from api.models import db, Booking, Listing
+
+MAX_TERMS = 8
+# Must match the index expressions in the search migration exactly.
+PG_BOOKING_DOC = ("to_tsvector('simple', coalesce(bookings.airbnb_guest_first_name, '') "
+                  "|| ' ' || coalesce(bookings.airbnb_guest_last_name, ''))")
+PG_LISTING_DOC = ("to_tsvector('simple', coalesce(listings.name, '') || ' ' || "
+                  "coalesce(listings.street, '') || ' ' || coalesce(listings.city, '') || ' ' || "
+                  "coalesce(listings.state, '') || ' ' || coalesce(listings.airbnb_address, '') || ' ' || "
+                  "coalesce(listings.airbnb_zipcode, ''))")
+
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS bookings_fts USING fts5(
+        airbnb_guest_first_name, airbnb_guest_last_name,
+        content='bookings', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS bookings_fts_ai AFTER INSERT ON bookings BEGIN
+        INSERT INTO bookings_fts(rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES (new.id, new.airbnb_guest_first_name, new.airbnb_guest_last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS bookings_fts_ad AFTER DELETE ON bookings BEGIN
+        INSERT INTO bookings_fts(bookings_fts, rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES ('delete', old.id, old.airbnb_guest_first_name, old.airbnb_guest_last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS bookings_fts_au AFTER UPDATE OF
+        airbnb_guest_first_name, airbnb_guest_last_name ON bookings BEGIN
+        INSERT INTO bookings_fts(bookings_fts, rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES ('delete', old.id, old.airbnb_guest_first_name, old.airbnb_guest_last_name);
+        INSERT INTO bookings_fts(rowid, airbnb_guest_first_name, airbnb_guest_last_name)
+        VALUES (new.id, new.airbnb_guest_first_name, new.airbnb_guest_last_name);
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+        name, street, city, state, airbnb_address, airbnb_zipcode,
+        content='listings', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN
+        INSERT INTO listings_fts(rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES (new.id, new.name, new.street, new.city, new.state, new.airbnb_address, new.airbnb_zipcode);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES ('delete', old.id, old.name, old.street, old.city, old.state, old.airbnb_address, old.airbnb_zipcode);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_au AFTER UPDATE OF
+        name, street, city, state, airbnb_address, airbnb_zipcode ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES ('delete', old.id, old.name, old.street, old.city, old.state, old.airbnb_address, old.airbnb_zipcode);
+        INSERT INTO listings_fts(rowid, name, street, city, state, airbnb_address, airbnb_zipcode)
+        VALUES (new.id, new.name, new.street, new.city, new.state, new.airbnb_address, new.airbnb_zipcode);
+    END""",
+]
+
+bookings_fts = table("bookings_fts", column("rowid"))
+listings_fts = table("listings_fts", column("rowid"))
+SQLITE_FTS_OBJECTS = {
+    "bookings_fts", "bookings_fts_ai", "bookings_fts_ad", "bookings_fts_au",
+    "listings_fts", "listings_fts_ai", "listings_fts_ad", "listings_fts_au",
+}
+_sqlite_ready = False
+_sqlite_lock = threading.Lock()
+
+
+def terms(q: str) -> List[str]:
+    return re.findall(r"\w+", (q or "").lower())[:MAX_TERMS]
+
+
+def ensure_sqlite_fts(connection) -> None:
+    """
+    Create the FTS5 tables/triggers if missing and index existing rows. A
+    missing trigger (SQLite table rebuilds drop them) means rows may have
+    been written unindexed, so that also triggers a full rebuild.
+    """
+    present = set(connection.execute(text(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")).scalars())
+    for ddl in SQLITE_FTS_DDL:
+        connection.execute(text(ddl))
+    if not SQLITE_FTS_OBJECTS <= present:
+        connection.execute(text("INSERT INTO bookings_fts(bookings_fts) VALUES ('rebuild')"))
+        connection.execute(text("INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')"))
+
+
+def _sqlite_search(words, user_id, limit):
+    global _sqlite_ready
+    if not _sqlite_ready:
+        with _sqlite_lock:
+            if not _sqlite_ready:
+                ensure_sqlite_fts(db.session.connection())
+                db.session.commit()
+                _sqlite_ready = True
+    match = " ".join(f'"{w}"*' for w in words)
+    bookings_doc = literal_column("bookings_fts")
+    listings_doc = literal_column("listings_fts")
+    bookings = (
+        select(*Booking.serialize_columns())
+        .select_from(bookings_fts)
+        .join(Booking, Booking.id == bookings_fts.c.rowid)
+        .join(Listing, Listing.id == Booking.listing_id)
+        .where(bookings_doc.op("MATCH")(match), Listing.user_id == user_id)
+        .order_by(func.bm25(bookings_doc))
+        .limit(limit)
+    )
+    listings = (
+        select(*Listing.serialize_columns())
+        .select_from(listings_fts)
+        .join(Listing, Listing.id == listings_fts.c.rowid)
+        .where(listings_doc.op("MATCH")(match), Listing.user_id == user_id)
+        .order_by(func.bm25(listings_doc))
+        .limit(limit)
+    )
+    return bookings, listings
+
+
+def _postgres_search(words, user_id, limit):
+    tsquery = func.to_tsquery("simple", " & ".join(f"{w}:*" for w in words))
+    booking_doc = literal_column(PG_BOOKING_DOC)
+    listing_doc = literal_column(PG_LISTING_DOC)
+    bookings = (
+        select(*Booking.serialize_columns())
+        .join(Listing, Listing.id == Booking.listing_id)
+        .where(booking_doc.op("@@")(tsquery), Listing.user_id == user_id)
+        .order_by(func.ts_rank(booking_doc, tsquery).desc())
+        .limit(limit)
+    )
+    listings = (
+        select(*Listing.serialize_columns())
+        .where(listing_doc.op("@@")(tsquery), Listing.user_id == user_id)
+        .order_by(func.ts_rank(listing_doc, tsquery).desc())
+        .limit(limit)
+    )
+    return bookings, listings
+
+
+def _like_search(words, user_id, limit):
+    def prefix(columns):
+        return and_(*[or_(*[func.lower(c).like(f"{w}%") for c in columns]) for w in words])
+    bookings = (
+        select(*Booking.serialize_columns())
+        .join(Listing, Listing.id == Booking.listing_id)
+        .where(prefix([Booking.airbnb_guest_first_name, Booking.airbnb_guest_last_name]),
+               Listing.user_id == user_id)
+        .limit(limit)
+    )
+    listings = (
+        select(*Listing.serialize_columns())
+        .where(prefix([Listing.name, Listing.street, Listing.city, Listing.state,
+                       Listing.airbnb_address, Listing.airbnb_zipcode]),
+               Listing.user_id == user_id)
+        .limit(limit)
+    )
+    return bookings, listings
+
+
+def search(q: str, user_id: int, limit: int = 20) -> Dict[str, list]:
+    """Ranked prefix matches among the user's bookings and listings."""
+    words = terms(q)
+    if not words:
+        return {"bookings": [], "listings": []}
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        bookings, listings = _postgres_search(words, user_id, limit)
+    elif dialect == "sqlite":
+        bookings, listings = _sqlite_search(words, user_id, limit)
+    else:
+        bookings, listings = _like_search(words, user_id, limit)
+    return {
+        "bookings": [Booking.serialize_row(r) for r in db.session.execute(bookings)],
+        "listings": [Listing.serialize_row(r) for r in db.session.execute(listings)],
+    }
@@ -0,0 +1,151 @@
+"""
+Static file serving for the built frontend (dist/).
+
+The directory is scanned once at startup into a manifest, so a request is a
+dict lookup: no os.path.isfile per request, SPA fallback to index.html is
+resolved in memory, and ETags/sizes/precompressed variants are precomputed.
+Files are streamed through the WSGI server's file_wrapper (sendfile under
+gunicorn).
+
+Set STATIC_BACKEND=whitenoise to put WhiteNoise in front of the app instead;
+it answers asset requests before they reach Flask and only unknown paths
+fall through to the SPA fallback here.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from flask import current_app, request
+from werkzeug.wsgi import wrap_file
+
+RE_FINGERPRINTED = re.compile(r"(^|/)assets/.+-[A-Za-z0-9_-]{8,}\.\w+$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DEFAULT_STATIC_MAX_AGE = 3600
+INDEX_FILE = "index.html"
+VARIANT_EXTENSIONS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@dataclass
+class StaticEntry:
+    path: str
+    filename: str
+    size: int
+    mtime: float
+    mimetype: str
+    etag: str
+    cache_control: str
+    # encoding -> (filename, size)
+    variants: Dict[str, Tuple[str, int]] = field(default_factory=dict)
+
+
+def cache_control_for(path: str) -> str:
+    if path == INDEX_FILE:
+        return "no-cache"
+    if RE_FINGERPRINTED.search(path):
+        return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return f"public, max-age={DEFAULT_STATIC_MAX_AGE}"
+
+
+def _file_etag(filename: str) -> str:
+    h = hashlib.blake2s(digest_size=12)
+    with open(filename, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class StaticManifest:
+    def __init__(self, root: str, autoreload: bool = False):
+        self.root = os.path.realpath(root)
+        self.autoreload = autoreload
+        self.entries: Dict[str, StaticEntry] = {}
+        self.build()
+
+    def build(self):
+        entries: Dict[str, StaticEntry] = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            names = set(filenames)
+            for name in filenames:
+                if name.endswith((".gz", ".br")) and name[:-3] in names:
+                    continue
+                full = os.path.join(dirpath, name)
+                rel = os.path.relpath(full, self.root).replace(os.sep, "/")
+                st = os.stat(full)
+                entry = StaticEntry(
+                    path=rel,
+                    filename=full,
+                    size=st.st_size,
+                    mtime=st.st_mtime,
+                    mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream",
+                    etag=_file_etag(full),
+                    cache_control=cache_control_for(rel),
+                )
+                for encoding, ext in VARIANT_EXTENSIONS:
+                    if name + ext in names:
+                        entry.variants[encoding] = (
+                            full + ext, os.stat(full + ext).st_size)
+                entries[rel] = entry
+        self.entries = entries
+        return self
+
+    def lookup(self, path: str) -> Optional[StaticEntry]:
+        entry = self.entries.get(path)
+        if entry is None and self.autoreload:
+            entry = self.build().entries.get(path)
+        return entry
+
+    def resolve(self, path: str) -> Optional[StaticEntry]:
+        """Exact file, or index.html for client-side routes (SPA fallback)."""
+        return self.lookup(path) or self.lookup(INDEX_FILE)
+
+    def serve(self, path: str):
+        entry = self.resolve(path)
+        if entry is None:
+            return current_app.response_class("Not Found", status=404)
+        return send_entry(entry)
+
+
+def send_entry(entry: StaticEntry):
+    response_class = current_app.response_class
+    if request.if_none_match and request.if_none_match.contains_weak(entry.etag):
+        response = response_class(status=304)
+    else:
+        encoding = request.accept_encodings.best_match(list(entry.variants)) \
+            if entry.variants else None
+        filename, size = entry.variants[encoding] if encoding else (entry.filename, entry.size)
+        fh = open(filename, "rb")
+        response = response_class(
+            wrap_file(request.environ, fh), mimetype=entry.mimetype,
+            direct_passthrough=True)
+        response.content_length = size
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.last_modified = entry.mtime
+    # Weak: the br/gzip/identity bodies are equivalent representations.
+    response.set_etag(entry.etag, weak=True)
+    response.headers["Cache-Control"] = entry.cache_control
+    if entry.variants:
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+def _whitenoise_headers(headers, path, url):
+    headers["Cache-Control"] = cache_control_for(url.lstrip("/"))
+
+
+def init_static(app, root: str):
+    """
+    Build the dist/ manifest and return it. With STATIC_BACKEND=whitenoise,
+    also wrap the WSGI app so assets never reach a Flask view.
+    """
+    manifest = StaticManifest(root, autoreload=app.debug)
+    if os.getenv("STATIC_BACKEND", "").lower() == "whitenoise":
+        from whitenoise import WhiteNoise
+        app.wsgi_app = WhiteNoise(
+            app.wsgi_app,
+            root=manifest.root,
+            add_headers_function=_whitenoise_headers,
+        )
+    return manifest
@@ -0,0 +1,127 @@
+"""
+Incremental maintenance of listing_stats.
+
+Every write path that changes a booking's listing or dates captures the
+booking's span before and after the change and calls apply_booking_change();
+only the (listing, month) rows the two spans touch are adjusted, with one
+INSERT .. ON CONFLICT DO UPDATE of relative values per row, so concurrent
+workers neither overwrite each other nor race to create the same month.
+
+The counters only stay right if they started from the bookings that existed
+before: the bbd4f0c2e7a1 migration (and `flask rebuild-listing-stats`)
+recompute them from scratch.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+
+from api.models import db, departure_date, Booking, BookingArchive, ListingStat
+
+# (listing_id, checkin, departure) or None when the booking doesn't count;
+# departure is exclusive: a one-night stay has departure == checkin + 1 day
+Span = Optional[Tuple[int, date, date]]
+FIELDS = ("nights_booked", "turnovers", "stays", "stay_nights")
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def booking_span(listing_id, checkin, last_night) -> Span:
+    """Span of a booking from its stored columns (airbnb_checkout is the last night)."""
+    checkin, last_night = _as_date(checkin), _as_date(last_night)
+    if not listing_id or not checkin or not last_night or last_night < checkin:
+        return None
+    return (listing_id, checkin, departure_date(last_night))
+
+
+def span_of(booking: Booking) -> Span:
+    return booking_span(booking.listing_id, booking.airbnb_checkin, booking.airbnb_checkout)
+
+
+def contributions(span: Span) -> Dict[Tuple[int, date], list]:
+    """Per (listing, month) [nights, turnovers, stays, stay_nights] of one booking."""
+    out: Dict[Tuple[int, date], list] = defaultdict(lambda: [0, 0, 0, 0])
+    if span is None:
+        return out
+    listing_id, checkin, checkout = span
+    cursor = checkin
+    while cursor < checkout:
+        boundary = min(next_month(cursor), checkout)
+        out[(listing_id, month_start(cursor))][0] += (boundary - cursor).days
+        cursor = boundary
+    out[(listing_id, month_start(checkout))][1] += 1
+    out[(listing_id, month_start(checkin))][2] += 1
+    out[(listing_id, month_start(checkin))][3] += (checkout - checkin).days
+    return out
+
+
+def _upsert():
+    dialect = db.session.get_bind().dialect.name
+    return (postgresql if dialect == "postgresql" else sqlite).insert(ListingStat)
+
+
+def _apply_deltas(deltas):
+    for (listing_id, month), values in deltas.items():
+        if not any(values):
+            continue
+        stmt = _upsert().values(
+            listing_id=listing_id, month=month, updated_at=datetime.utcnow(),
+            **dict(zip(FIELDS, values)))
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[ListingStat.listing_id, ListingStat.month],
+            set_={"updated_at": stmt.excluded.updated_at,
+                  **{f: getattr(ListingStat, f) + getattr(stmt.excluded, f) for f in FIELDS}},
+        ))
+
+
+def apply_booking_change(old: Span, new: Span):
+    """Move a booking's contribution from its old span to its new one."""
+    if old == new:
+        return
+    deltas: Dict[Tuple[int, date], list] = defaultdict(lambda: [0, 0, 0, 0])
+    for key, values in contributions(old).items():
+        deltas[key] = [d - v for d, v in zip(deltas[key], values)]
+    for key, values in contributions(new).items():
+        deltas[key] = [d + v for d, v in zip(deltas[key], values)]
+    _apply_deltas(deltas)
+
+
+def rebuild_listing_stats(listing_id: int | None = None) -> int:
+    """
+    Recompute listing_stats from bookings and bookings_archive (backfill /
+    repair). Archiving leaves listing_stats untouched, so both count.
+    Returns rows written.
+    """
+    parts = []
+    for model in (Booking, BookingArchive):
+        part = select(model.listing_id, model.airbnb_checkin, model.airbnb_checkout)
+        if listing_id is not None:
+            part = part.where(model.listing_id == listing_id)
+        parts.append(part)
+    q = union_all(*parts)
+    wipe = delete(ListingStat)
+    if listing_id is not None:
+        wipe = wipe.where(ListingStat.listing_id == listing_id)
+    totals: Dict[Tuple[int, date], list] = defaultdict(lambda: [0, 0, 0, 0])
+    for row in db.session.execute(q):
+        for key, values in contributions(booking_span(*row)).items():
+            totals[key] = [t + v for t, v in zip(totals[key], values)]
+    db.session.execute(wipe)
+    db.session.add_all(
+        ListingStat(listing_id=lid, month=month, **dict(zip(FIELDS, values)))
+        for (lid, month), values in totals.items()
+    )
+    return len(totals)
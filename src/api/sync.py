@@ -0,0 +1,225 @@
+"""
+ICS feed -> bookings sync, inline (sync_listing) or as checkpointed
+background jobs (SyncJob rows driven by run_sync_job).
+
+A listing has at most one queued/running job: the partial unique index
+uq_sync_jobs_active_listing enforces it across workers, enqueue_sync_job
+falls back to the existing job when its insert loses the race.
+
+Jobs checkpoint on the (checkin, uid) key of the last row they committed,
+not on an offset, so a feed that gained or lost rows between attempts
+resumes after the right row; rows that appeared before the checkpoint in
+the meantime are caught up with one lookup. Upserts are idempotent, so a
+retried batch is harmless.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from api.models import db, Booking, SyncJob
+from api.stats import apply_booking_change, span_of
+from api.archive import archive_horizon, is_archived
+from api.occupancy import timeline
+from api.events import broker
+from api.ics_feed import fetch_reserved_rows
+
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "100"))
+SYNC_STALE_AFTER = timedelta(minutes=5)
+
+
+def row_key(row: Dict[str, Any]) -> Tuple[str, str]:
+    """Sort/checkpoint key of a feed row; fetch_reserved_rows returns rows in this order."""
+    return row["checkin"], row["event"]
+
+
+def upsert_reserved_rows(listing_id: int, rows: List[Dict[str, Any]]):
+    """
+    Upsert feed rows as bookings without committing.
+    Returns (created, updated, events) where events are (kind, booking dict)
+    to publish once the caller has committed.
+    """
+    created = updated = 0
+    changed = []
+    horizon = archive_horizon()
+    for r in rows:
+        uid = r["event"]
+        ci = datetime.fromisoformat(r["checkin"][:10])
+        co = datetime.fromisoformat(r["checkout"][:10])
+        booking = db.session.execute(
+            select(Booking).where(
+                Booking.listing_id == listing_id,
+                Booking.google_calendar_id == uid
+            )
+        ).scalar_one_or_none()
+        # old stays still in the feed were archived; don't resurrect them
+        if booking is None and horizon is not None and co <= horizon \
+                and is_archived(listing_id, uid):
+            continue
+        if booking is None:
+            booking = Booking(
+                listing_id=listing_id,
+                google_calendar_id=uid,
+                needs_manual_details=True
+            )
+            db.session.add(booking)
+            created += 1
+            kind = "create"
+        else:
+            updated += 1
+            kind = "update"
+        before = span_of(booking)
+        booking.airbnb_checkin = ci
+        booking.airbnb_checkout = co
+        booking.reservation_url = r.get("reservation_url")
+        booking.phone_last4 = r.get("phone_last4")
+        booking.airbnb_guestpic_url = r.get("image")
+        # check before apply_booking_change, whose UPDATE autoflushes
+        if kind == "create" or db.session.is_modified(booking):
+            changed.append((kind, booking))
+        apply_booking_change(before, span_of(booking))
+    db.session.flush()
+    return created, updated, [(kind, b.serialize()) for kind, b in changed]
+
+
+def sync_listing(listing_id: int) -> Dict[str, Any]:
+    """Sync the whole feed into one listing in a single transaction."""
+    rows = fetch_reserved_rows()
+    created, updated, events = upsert_reserved_rows(listing_id, rows)
+    db.session.commit()
+    broker.publish_many(events)
+    timeline.refresh()
+    return {"ok": True, "created": created, "updated": updated}
+
+
+def job_is_stale(job: SyncJob) -> bool:
+    """A running job whose worker stopped reporting progress."""
+    return job.status == "running" and job.updated_at < datetime.utcnow() - SYNC_STALE_AFTER
+
+
+def claim_stale_job(job: SyncJob) -> bool:
+    """
+    Take over a stale job. The conditional UPDATE succeeds for exactly one
+    caller even when several workers notice the same stale job.
+    """
+    result = db.session.execute(
+        update(SyncJob)
+        .where(SyncJob.id == job.id, SyncJob.status == "running",
+               SyncJob.updated_at == job.updated_at)
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _catch_up(job: SyncJob, done: List[Dict[str, Any]]) -> None:
+    """
+    Upsert rows at or before the checkpoint that have no booking yet: stays
+    added to the feed with an earlier check-in since the previous attempt.
+    """
+    known = set(db.session.execute(
+        select(Booking.google_calendar_id).where(
+            Booking.listing_id == job.listing_id,
+            Booking.google_calendar_id.in_([r["event"] for r in done]))
+    ).scalars())
+    late = [r for r in done if r["event"] not in known]
+    if not late:
+        return
+    created, updated, events = upsert_reserved_rows(job.listing_id, late)
+    job.created += created
+    job.updated += updated
+    db.session.commit()
+    broker.publish_many(events)
+
+
+def run_sync_job(job_id: int) -> SyncJob | None:
+    """
+    Process a sync job in batches. Each batch commits its bookings together
+    with the job's checkpoint (last_checkin, last_uid), so an interrupted
+    job resumes after the last committed row of the freshly fetched feed.
+    """
+    job = db.session.get(SyncJob, job_id)
+    if job is None or job.status in ("succeeded", "failed"):
+        return job
+    job.status = "running"
+    job.started_at = job.started_at or datetime.utcnow()
+    job.error = None
+    db.session.commit()
+    try:
+        rows = fetch_reserved_rows()
+        job.total = len(rows)
+        remaining = rows
+        if job.last_uid is not None:
+            checkpoint = (job.last_checkin, job.last_uid)
+            done = [r for r in rows if row_key(r) <= checkpoint]
+            remaining = rows[len(done):]
+            _catch_up(job, done)
+        job.processed = len(rows) - len(remaining)
+        for start in range(0, len(remaining), SYNC_BATCH_SIZE):
+            batch = remaining[start:start + SYNC_BATCH_SIZE]
+            created, updated, events = upsert_reserved_rows(job.listing_id, batch)
+            job.last_checkin, job.last_uid = row_key(batch[-1])
+            job.processed += len(batch)
+            job.created += created
+            job.updated += updated
+            db.session.commit()
+            broker.publish_many(events)
+        job.status = "succeeded"
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        timeline.refresh()
+    except Exception as e:
+        current_app.logger.exception("sync job %s failed: %s", job_id, e)
+        db.session.rollback()
+        job = db.session.get(SyncJob, job_id)
+        job.status = "failed"
+        job.error = str(e)[:1024]
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    return job
+
+
+def start_sync_worker(job_id: int):
+    app = current_app._get_current_object()
+
+    def work():
+        with app.app_context():
+            run_sync_job(job_id)
+
+    threading.Thread(target=work, name=f"sync-job-{job_id}", daemon=True).start()
+
+
+def _active_job(listing_id: int) -> SyncJob | None:
+    return db.session.execute(
+        select(SyncJob)
+        .where(SyncJob.listing_id == listing_id,
+               SyncJob.status.in_(("queued", "running")))
+    ).scalars().first()
+
+
+def enqueue_sync_job(listing_id: int):
+    """Return (job, created). An active job for the listing is reused."""
+    job = _active_job(listing_id)
+    if job is None:
+        job = SyncJob(listing_id=listing_id, status="queued")
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # another worker enqueued one between our SELECT and INSERT
+            db.session.rollback()
+            job = _active_job(listing_id)
+            if job is None:
+                raise
+        else:
+            start_sync_worker(job.id)
+            return job, True
+    if job_is_stale(job) and claim_stale_job(job):
+        start_sync_worker(job.id)
+    return job, False
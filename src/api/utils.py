@@ -1,4 +1,10 @@
-from flask import jsonify, url_for
+import hashlib
+import os
+from datetime import timezone
+from functools import wraps
+from flask import jsonify, url_for, request, make_response
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from sqlalchemy import select, func
 
 class APIException(Exception):
     status_code = 400
@@ -15,6 +21,86 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+# -----------------------------
+# HTTP validation (ETag / Last-Modified)
+# -----------------------------
+
+def weak_etag(*parts):
+    """Hash the given version parts (ids, counts, timestamps) into an ETag value."""
+    raw = "|".join(
+        "" if p is None else (p.isoformat() if hasattr(p, "isoformat") else str(p))
+        for p in parts
+    )
+    return hashlib.blake2s(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+def collection_version(session, model, *criteria):
+    """
+    Version of a filtered collection as (etag, last_modified), computed from
+    count(*) and max(updated_at) so a poll costs one aggregate query.
+    """
+    count, last = session.execute(
+        select(func.count(), func.max(model.updated_at))
+        .select_from(model)
+        .where(*criteria)
+    ).one()
+    return weak_etag(model.__tablename__, count, last), last
+
+def row_version(obj):
+    """Version of a single row as (etag, last_modified)."""
+    return weak_etag(obj.__tablename__, obj.id, obj.updated_at), obj.updated_at
+
+def _as_utc(dt):
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).replace(microsecond=0)
+
+def not_modified(etag, last_modified=None):
+    """
+    Return a ready 304 response when the client already holds this version,
+    otherwise None. Call it before loading/serializing the payload.
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        fresh = _as_utc(last_modified) <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return with_validators(make_response("", 304), etag, last_modified)
+
+def with_validators(response, etag, last_modified=None):
+    """Attach ETag/Last-Modified and ask clients to revalidate on every use."""
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    response.cache_control.no_cache = True
+    return response
+
+# -----------------------------
+# Admin guard
+# -----------------------------
+
+def admin_required(fn):
+    """
+    Require a valid JWT whose user's email is listed in ADMIN_EMAILS (comma
+    separated). With no list configured every admin route is closed.
+    """
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        admins = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+        if not admins:
+            return jsonify({"error": "admin access is not configured"}), 403
+        from api.models import db, User
+        user = db.session.get(User, int(get_jwt_identity()))
+        if user is None or user.email.lower() not in admins:
+            return jsonify({"error": "admin only"}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
@@ -2,23 +2,43 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for, send_from_directory
+from flask import Flask, request, jsonify, url_for
 from flask_cors import CORS  # Add this import
-from flask_migrate import Migrate
-from flask_swagger import swagger
+from werkzeug.middleware.proxy_fix import ProxyFix
 from api.utils import APIException, generate_sitemap
+from api.json_provider import FastJSONProvider
+from api.compression import init_compression
+from api.profiling import init_profiling
+from api.occupancy import init_occupancy
+from api.static_files import init_static
 from api.models import db
 from api.routes import api
-from api.admin import setup_admin
 from api.commands import setup_commands
 from flask_jwt_extended import JWTManager
 
 # from models import Person
 
 ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
+# gunicorn sets SERVER_SOFTWARE before it loads the app
+SERVING = os.getenv("SERVER_SOFTWARE", "").startswith("gunicorn")
+
+
+def _env_flag(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 static_file_dir = os.path.join(os.path.dirname(
     os.path.realpath(__file__)), '../dist/')
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+# Number of reverse proxies in front of the app (1 on Render/Heroku). Only
+# then is X-Forwarded-For trusted, and only the hops those proxies appended.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS,
+                            x_proto=TRUSTED_PROXY_HOPS, x_host=TRUSTED_PROXY_HOPS)
 # Change this "super secret" to something else!
 app.config["JWT_SECRET_KEY"] = "super-secret"
 jwt = JWTManager(app)
@@ -38,15 +58,36 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-MIGRATE = Migrate(app, db, compare_type=True)
+# Admin UI and migration tooling are opt-in on web workers: they cost ~450ms
+# of imports per worker and are never used on the request path.
+app.config['ENABLE_ADMIN'] = _env_flag("ENABLE_ADMIN", ENV == "development")
+app.config['ENABLE_MIGRATIONS'] = _env_flag("ENABLE_MIGRATIONS", not SERVING)
 db.init_app(app)
 
+if app.config['ENABLE_MIGRATIONS']:
+    from flask_migrate import Migrate
+    MIGRATE = Migrate(app, db, compare_type=True)
+
 # add the admin
-setup_admin(app)
+if app.config['ENABLE_ADMIN']:
+    from api.admin import setup_admin
+    setup_admin(app)
 
 # add the commands
 setup_commands(app)
 
+# gzip/brotli for JSON responses
+init_compression(app)
+
+# opt-in cProfile of single requests (PROFILING_ENABLED, see api.profiling)
+init_profiling(app)
+
+# keep Listing.current_booking_id moving with check-ins/checkouts (see api.occupancy)
+init_occupancy(app)
+
+# dist/ manifest (optionally fronted by WhiteNoise, see STATIC_BACKEND)
+static_manifest = init_static(app, static_file_dir)
+
 # Add all endpoints from the API with a "api" prefix
 app.register_blueprint(api, url_prefix='/api')
 
@@ -64,18 +105,14 @@ def handle_invalid_usage(error):
 def sitemap():
     if ENV == "development":
         return generate_sitemap(app)
-    return send_from_directory(static_file_dir, 'index.html')
+    return static_manifest.serve('index.html')
 
 # any other endpoint will try to serve it like a static file
 
 
 @app.route('/<path:path>', methods=['GET'])
 def serve_any_other_file(path):
-    if not os.path.isfile(os.path.join(static_file_dir, path)):
-        path = 'index.html'
-    response = send_from_directory(static_file_dir, path)
-    response.cache_control.max_age = 0  # avoid cache memory
-    return response
+    return static_manifest.serve(path)
 
 
 # this only runs if `$ python src/main.py` is executed
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from api.archive import archive_bookings
+from api.models import db, Booking, BookingArchive, Listing
+
+
+def test_archived_ids_are_not_reused(app, user):
+    listing = Listing(user_id=user.id, airbnb_address="1 Main St")
+    db.session.add(listing)
+    db.session.flush()
+    old = Booking(listing_id=listing.id, google_calendar_id="old",
+                  airbnb_checkin=datetime(2020, 1, 1), airbnb_checkout=datetime(2020, 1, 3))
+    db.session.add(old)
+    db.session.commit()
+    old_id = old.id
+
+    assert archive_bookings(older_than_days=30) == 1
+    new = Booking(listing_id=listing.id, google_calendar_id="new",
+                  airbnb_checkin=datetime(2020, 2, 1), airbnb_checkout=datetime(2020, 2, 3))
+    db.session.add(new)
+    db.session.commit()
+
+    assert new.id != old_id
+    assert archive_bookings(older_than_days=30) == 1
+    assert set(db.session.execute(select(BookingArchive.google_calendar_id)).scalars()) == {"old", "new"}
@@ -0,0 +1,58 @@
+import pytest
+
+from api.events import broker
+from api.models import db, Listing, User
+
+
+@pytest.fixture
+def listings(user):
+    other = User(email="other@example.com", password="x")
+    db.session.add(other)
+    db.session.flush()
+    mine = Listing(user_id=user.id, airbnb_address="1 Main St")
+    theirs = Listing(user_id=other.id, airbnb_address="2 Main St")
+    db.session.add_all([mine, theirs])
+    db.session.commit()
+    return mine.id, theirs.id
+
+
+def test_stream_requires_a_jwt(client):
+    assert client.get("/api/bookings/stream").status_code == 401
+
+
+def test_stream_rejects_a_listing_of_another_host(client, auth_headers, listings):
+    _, theirs = listings
+    resp = client.get(f"/api/bookings/stream?listing_id={theirs}", headers=auth_headers)
+    assert resp.status_code == 404
+
+
+def test_stream_only_sends_the_callers_events(app, user, listings):
+    mine, theirs = listings
+    broker.start(app)
+    last_id = broker.last_id
+    broker.publish("update", {"id": 1, "listing_id": theirs, "phone_last4": "1111"})
+    broker.publish("update", {"id": 2, "listing_id": mine, "phone_last4": "2222"})
+    lines = broker.stream(user.id, last_id, heartbeat=2)
+    assert next(lines).startswith("retry:")
+    event = next(lines)
+    assert '"listing_id":%d' % mine in event
+    assert "1111" not in event
+
+
+def test_streams_are_capped_per_worker(client, auth_headers, listings, monkeypatch):
+    monkeypatch.setattr(broker, "acquire_stream", lambda: False)
+    resp = client.get("/api/bookings/stream?jwt=" + auth_headers["Authorization"][7:])
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "10"
+
+
+def test_publish_many_is_one_round_trip_per_batch(app, listings, count_queries):
+    mine, theirs = listings
+    events = [("update", {"id": i, "listing_id": mine if i % 2 else theirs}) for i in range(50)]
+
+    with count_queries() as queries:
+        ids = broker.publish_many(events)
+
+    assert len(set(ids)) == 50
+    # owner lookup + one multi-row INSERT .. RETURNING, whatever the batch size
+    assert queries.count == 2, queries.statements
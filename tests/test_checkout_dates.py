@@ -0,0 +1,89 @@
+"""
+airbnb_checkout stores the last night of a stay, not the departure day.
+One feed stay followed through import, stats, occupancy and the iCal export.
+"""
+from datetime import datetime
+
+import pytest
+import requests
+from sqlalchemy import select
+
+from api import ics_feed, sync
+from api.models import db, Booking, Listing, ListingStat
+from api.occupancy import OccupancyTimeline, checkout_at
+
+# three nights, Jan 30 - Feb 1; the guest leaves on Feb 2 (DTEND is exclusive)
+FEED = (b"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//EN\r\n"
+        b"BEGIN:VEVENT\r\nUID:stay\r\nSUMMARY:Reserved\r\n"
+        b"DTSTART;VALUE=DATE:20250130\r\nDTEND;VALUE=DATE:20250202\r\n"
+        b"END:VEVENT\r\nEND:VCALENDAR\r\n")
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    """Serve `feed.content` as the reservations feed."""
+    response = FakeResponse(FEED)
+    monkeypatch.setattr(requests, "get", lambda url, timeout: response)
+    monkeypatch.setattr(sync, "fetch_reserved_rows",
+                        lambda: ics_feed._parse_reserved_rows("America/New_York"))
+    return response
+
+
+@pytest.fixture
+def booking(app, user, feed):
+    listing = Listing(user_id=user.id, airbnb_address="1 Main St")
+    db.session.add(listing)
+    db.session.commit()
+    sync.sync_listing(listing.id)
+    return db.session.execute(select(Booking)).scalar_one()
+
+
+def test_the_feed_imports_the_last_night(booking):
+    assert booking.airbnb_checkin == datetime(2025, 1, 30)
+    assert booking.airbnb_checkout == datetime(2025, 2, 1)
+
+
+def test_stats_count_nights_up_to_the_last_one(booking):
+    stats = {s.month.strftime("%Y-%m"): (s.nights_booked, s.turnovers, s.stays, s.stay_nights)
+             for s in db.session.execute(select(ListingStat)).scalars()}
+    # Feb 1 is a booked night; the turnover is on the departure day, still February
+    assert stats == {"2025-01": (2, 0, 1, 3), "2025-02": (1, 1, 0, 0)}
+
+
+def test_the_guest_is_current_until_checkout_time_on_the_departure_day(booking):
+    listing = db.session.get(Listing, booking.listing_id)
+    assert checkout_at(booking.airbnb_checkout) == datetime(2025, 2, 2, 11)
+    timeline = OccupancyTimeline()
+
+    timeline.refresh(datetime(2025, 2, 2, 10, 59))
+    db.session.refresh(listing)
+    assert listing.current_booking_id == booking.id
+
+    timeline.refresh(datetime(2025, 2, 2, 11))
+    db.session.refresh(listing)
+    assert listing.current_booking_id is None
+
+
+def test_the_ical_export_round_trips_through_the_importer(client, booking, feed):
+    listing = db.session.get(Listing, booking.listing_id)
+    resp = client.get(f"/api/listings/{listing.id}/calendar.ics?token={listing.calendar_token}")
+    assert resp.status_code == 200
+    body = resp.get_data(as_text=True)
+    assert "DTSTART;VALUE=DATE:20250130\r\n" in body
+    assert "DTEND;VALUE=DATE:20250202\r\n" in body
+
+    feed.content = resp.data
+    [row] = ics_feed._parse_reserved_rows("America/New_York")
+    assert (row["checkin"][:10], row["checkout"][:10]) == ("2025-01-30", "2025-02-01")
+    # importing our own export again changes nothing
+    assert sync.sync_listing(listing.id) == {"ok": True, "created": 0, "updated": 1}
+    db.session.refresh(booking)
+    assert booking.airbnb_checkout == datetime(2025, 2, 1)
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+DEFERRED = ("flask_admin", "flask_migrate", "icalendar")
+
+
+def imported_modules(env):
+    """Top-level package names imported by `import app`, from -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=SRC, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+    names = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            names.add(name.split(".")[0])
+    return names
+
+
+def test_gunicorn_worker_skips_admin_migrations_and_icalendar(tmp_path):
+    env = {k: v for k, v in os.environ.items()
+           if k not in ("FLASK_DEBUG", "ENABLE_ADMIN", "ENABLE_MIGRATIONS")}
+    env.update(SERVER_SOFTWARE="gunicorn/23.0.0",
+               DATABASE_URL=f"sqlite:///{tmp_path}/import.db")
+
+    names = imported_modules(env)
+
+    assert "flask" in names  # the import actually ran
+    leaked = sorted(names & set(DEFERRED))
+    assert not leaked, f"imported at startup: {leaked}"
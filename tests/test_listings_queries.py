@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+
+from api.models import db, Booking, Listing
+
+
+def add_listings(user, count):
+    for i in range(count):
+        listing = Listing(user_id=user.id, airbnb_address=f"{i} Main St", city="Miami")
+        db.session.add(listing)
+        db.session.flush()
+        booking = Booking(listing_id=listing.id, google_calendar_id=f"uid-{listing.id}",
+                          airbnb_checkin=datetime(2025, 1, 1), airbnb_checkout=datetime(2025, 1, 3))
+        db.session.add(booking)
+        db.session.flush()
+        listing.current_booking_id = booking.id
+    db.session.commit()
+
+
+@pytest.mark.parametrize("listings", [1, 5, 25])
+def test_list_listings_query_count_is_constant(client, user, auth_headers, count_queries, listings):
+    add_listings(user, listings)
+    db.session.expire_all()
+
+    with count_queries() as queries:
+        resp = client.get("/api/listings?per_page=50", headers=auth_headers)
+
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["total"] == listings
+    assert all(l["current_booking"] is not None for l in body["listings"])
+    # count, listings page, current bookings (selectinload)
+    assert queries.count == 3, queries.statements
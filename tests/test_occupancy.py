@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from flask import Flask
+
+from api import occupancy
+from api.models import db, Booking, Listing
+from api.occupancy import OccupancyTimeline, init_occupancy
+
+
+def test_timer_starts_on_the_first_request(monkeypatch):
+    started = []
+    monkeypatch.setattr(occupancy.timeline, "start", lambda app, interval: started.append(interval))
+    app = Flask(__name__)
+    app.config["OCCUPANCY_TICK_SECONDS"] = 30
+    init_occupancy(app)
+    app.add_url_rule("/ping", "ping", lambda: "ok")
+
+    app.test_client().get("/ping")
+
+    assert started == [30]
+
+
+def test_listings_show_the_guest_once_the_timer_ticked(client, user, auth_headers):
+    listing = Listing(user_id=user.id, airbnb_address="1 Main St")
+    db.session.add(listing)
+    db.session.flush()
+    # one night, Jan 1; in the unit until checkout time on Jan 2
+    db.session.add(Booking(listing_id=listing.id, google_calendar_id="stay",
+                           airbnb_checkin=datetime(2025, 1, 1), airbnb_checkout=datetime(2025, 1, 1)))
+    db.session.commit()
+    timeline = OccupancyTimeline()
+    timeline.refresh(datetime(2024, 12, 31, 12))
+
+    timeline.advance(datetime(2025, 1, 2, 9))
+    listings = client.get("/api/listings", headers=auth_headers).get_json()["listings"]
+    assert listings[0]["current_booking"]["google_calendar_id"] == "stay"
+
+    timeline.advance(datetime(2025, 1, 2, 11))
+    listings = client.get("/api/listings", headers=auth_headers).get_json()["listings"]
+    assert listings[0]["current_booking"] is None
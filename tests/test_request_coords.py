@@ -0,0 +1,39 @@
+from flask_jwt_extended import create_access_token
+
+from api import geocoding
+from api.models import db, Listing, User
+
+
+def add_listing(user, **fields):
+    listing = Listing(user_id=user.id, airbnb_address="1 Main St", city="Miami", **fields)
+    db.session.add(listing)
+    db.session.commit()
+    return listing.id
+
+
+def test_listing_id_requires_a_jwt(client, user):
+    listing_id = add_listing(user, latitude=25.7, longitude=-80.2)
+    resp = client.get(f"/api/weather/current?listing_id={listing_id}")
+    assert resp.status_code == 401
+
+
+def test_listing_id_is_owner_scoped(client, user):
+    listing_id = add_listing(user, latitude=25.7, longitude=-80.2)
+    other = User(email="other@example.com", password="x")
+    db.session.add(other)
+    db.session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(other.id))}"}
+    resp = client.get(f"/api/weather/current?listing_id={listing_id}", headers=headers)
+    assert resp.status_code == 404
+
+
+def test_geocoder_failure_is_a_json_502(client, user, auth_headers, monkeypatch):
+    listing_id = add_listing(user)
+
+    def unavailable(address):
+        raise ConnectionError("geocoder down")
+
+    monkeypatch.setattr(geocoding, "geocode_address", unavailable)
+    resp = client.get(f"/api/restaurants/nearby?listing_id={listing_id}", headers=auth_headers)
+    assert resp.status_code == 502
+    assert resp.get_json() == {"error": "Geocoding service unavailable"}
@@ -0,0 +1,28 @@
+from sqlalchemy import text
+
+from api.models import db, Listing
+from api.search import ensure_sqlite_fts
+
+
+def indexed(word):
+    return db.session.execute(text(
+        "SELECT rowid FROM listings_fts WHERE listings_fts MATCH :q"), {"q": word}).scalars().all()
+
+
+def test_missing_triggers_force_a_rebuild(app, user):
+    ensure_sqlite_fts(db.session.connection())
+    db.session.add(Listing(user_id=user.id, airbnb_address="1 Harbor St"))
+    db.session.commit()
+    # what a SQLite batch rebuild of listings does to the triggers
+    for trigger in ("listings_fts_ai", "listings_fts_ad", "listings_fts_au"):
+        db.session.execute(text(f"DROP TRIGGER {trigger}"))
+    lost = Listing(user_id=user.id, airbnb_address="2 Lighthouse Rd")
+    db.session.add(lost)
+    db.session.commit()
+    assert indexed("lighthouse") == []
+
+    ensure_sqlite_fts(db.session.connection())
+    db.session.commit()
+
+    assert indexed("lighthouse") == [lost.id]
+    assert len(indexed("harbor")) == 1
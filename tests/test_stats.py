@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from api.models import db, Booking, Listing, ListingStat
+from api.stats import apply_booking_change, rebuild_listing_stats, span_of
+
+
+def stats():
+    return {(s.listing_id, s.month.strftime("%Y-%m")): (s.nights_booked, s.turnovers, s.stays, s.stay_nights)
+            for s in db.session.execute(select(ListingStat)).scalars()
+            if any((s.nights_booked, s.turnovers, s.stays, s.stay_nights))}
+
+
+def test_moving_a_booking_matches_a_rebuild(app, user):
+    first = Listing(user_id=user.id, airbnb_address="1 Main St")
+    second = Listing(user_id=user.id, airbnb_address="2 Main St")
+    db.session.add_all([first, second])
+    db.session.flush()
+    # last night Jan 31: three nights in January, departure Feb 1
+    booking = Booking(listing_id=first.id, google_calendar_id="stay",
+                      airbnb_checkin=datetime(2025, 1, 29), airbnb_checkout=datetime(2025, 1, 31))
+    db.session.add(booking)
+    db.session.flush()
+    apply_booking_change(None, span_of(booking))
+    db.session.commit()
+    assert stats() == {(first.id, "2025-01"): (3, 0, 1, 3), (first.id, "2025-02"): (0, 1, 0, 0)}
+
+    before = span_of(booking)
+    booking.listing_id = second.id
+    apply_booking_change(before, span_of(booking))
+    db.session.commit()
+    moved = stats()
+    assert all(v >= 0 for values in moved.values() for v in values)
+
+    rebuild_listing_stats()
+    db.session.commit()
+    assert moved == stats() == {(second.id, "2025-01"): (3, 0, 1, 3), (second.id, "2025-02"): (0, 1, 0, 0)}
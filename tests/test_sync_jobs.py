@@ -0,0 +1,92 @@
+from sqlalchemy import select
+
+from api import sync
+from api.models import db, Booking, Listing, SyncJob
+
+
+def feed_row(uid, day):
+    return {"event": uid, "checkin": f"2025-01-{day:02d}T00:00:00-05:00",
+            "checkout": f"2025-01-{day + 2:02d}T00:00:00-05:00"}
+
+
+class Crash(BaseException):
+    """Stands in for the worker process dying: not caught by run_sync_job."""
+
+
+def test_a_crashed_job_resumes_after_its_checkpoint_in_a_shifted_feed(app, user, monkeypatch):
+    listing = Listing(user_id=user.id, airbnb_address="1 Main St")
+    db.session.add(listing)
+    db.session.commit()
+    job = SyncJob(listing_id=listing.id, status="queued")
+    db.session.add(job)
+    db.session.commit()
+    listing_id, job_id = listing.id, job.id
+    monkeypatch.setattr(sync, "SYNC_BATCH_SIZE", 2)
+
+    feed = [feed_row("a", 1), feed_row("b", 5), feed_row("c", 10), feed_row("d", 15)]
+    monkeypatch.setattr(sync, "fetch_reserved_rows", lambda: feed)
+
+    def crash(events):
+        raise Crash()
+    monkeypatch.setattr(sync.broker, "publish_many", crash)
+    try:
+        sync.run_sync_job(job_id)
+    except Crash:
+        pass
+    db.session.remove()
+    job = db.session.get(SyncJob, job_id)
+    assert (job.status, job.last_uid, job.processed) == ("running", "b", 2)
+
+    # meanwhile the feed gained a stay before the checkpoint and one at the end
+    feed = sorted(feed + [feed_row("early", 3), feed_row("e", 20)], key=sync.row_key)
+    published = []
+    monkeypatch.setattr(sync, "fetch_reserved_rows", lambda: feed)
+    monkeypatch.setattr(sync.broker, "publish_many", lambda events: published.extend(events))
+    job = sync.run_sync_job(job_id)
+
+    assert job.status == "succeeded"
+    assert (job.processed, job.created, job.updated) == (6, 6, 0)
+    uids = db.session.execute(
+        select(Booking.google_calendar_id).where(Booking.listing_id == listing_id)).scalars()
+    assert sorted(uids) == ["a", "b", "c", "d", "e", "early"]
+    # rows committed before the crash are not upserted again
+    assert sorted(b["google_calendar_id"] for _, b in published) == ["c", "d", "e", "early"]
+
+
+def test_enqueueing_twice_returns_the_active_job(app, user, monkeypatch):
+    listing = Listing(user_id=user.id, airbnb_address="1 Main St")
+    db.session.add(listing)
+    db.session.commit()
+    started = []
+    monkeypatch.setattr(sync, "start_sync_worker", started.append)
+
+    first, created = sync.enqueue_sync_job(listing.id)
+    assert created
+    second, created = sync.enqueue_sync_job(listing.id)
+    assert not created
+    assert second.id == first.id
+    assert started == [first.id]
+
+
+def test_an_enqueue_losing_the_insert_race_returns_the_winner(app, user, monkeypatch):
+    listing = Listing(user_id=user.id, airbnb_address="1 Main St")
+    db.session.add(listing)
+    db.session.commit()
+    started = []
+    monkeypatch.setattr(sync, "start_sync_worker", started.append)
+    winner, _ = sync.enqueue_sync_job(listing.id)
+
+    # the other worker's job is not visible yet when this one checks
+    active = sync._active_job
+    checks = []
+
+    def not_seen_first(listing_id):
+        checks.append(listing_id)
+        return None if len(checks) == 1 else active(listing_id)
+    monkeypatch.setattr(sync, "_active_job", not_seen_first)
+    job, created = sync.enqueue_sync_job(listing.id)
+
+    assert not created
+    assert job.id == winner.id
+    assert started == [winner.id]
+    assert db.session.execute(select(SyncJob)).scalars().all() == [winner]